@@ -1,351 +1,2593 @@
-'''                                                                     
-88888888ba,    88               88  88      a8P   88                                
-88      `"8b   ""               ""  88    ,88'    88                         ,d     
-88        `8b                       88  ,88"      88                         88     
-88         88  88   ,adPPYb,d8  88  88,d88'       88,dPPYba,    ,adPPYba,  MM88MMM  
-88         88  88  a8"    `Y88  88  8888"88,      88P'    "8a  a8P_____88    88     
-88         8P  88  8b       88  88  88P   Y8b     88       88  8PP"""""""    88     
-88      .a8P   88  "8a,   ,d88  88  88     "88,   88       88  "8b,   ,aa    88,    
-88888888Y"'    88   `"YbbdP"Y8  88  88       Y8b  88       88   `"Ybbd8"'    "Y888  
-                    aa,    ,88                                                      
-                     "YbbbdP" 
-
-A digital version of one of my favorite childhood board games: Khet - the Laser Board Game!
-By:  Blake McGill
-Last Revision: 04/27/2022
-
-Goals:
-    Phase One: implement base game with simple tkinter GUI for local play
-    Phase Two: implement base game with Raspberry Pi dedicated web server for online/network play
-        -Pass game state to webpage generation script
-        -Use HTML/CSS/JS to generate webpage based on game state
-    Phase Three: implement AI for playing against computer
-        -Use evaluation dunder methods (__ge__, __eq_, etc.) for programmatic AI implementation
-        -Use neural network algorithms for advanced AI
-
-Log:
-    -03/01/2021//Set up classes and brief explanation for some. Added rules dump and goals. Started Gamepiece class.
-    -03/07/2021//Created PieceSide dataclass as the value for each gamepiece's side. Created debug interface to test classes.
-    -03/08/2021//Updated comments, docstrings, added them where possible, continuing gamepiece class development.
-    -02/20/2022//Replaced method for reflection of laser when it interacts with gamepiece (new-> ReflectMatrix)
-    -04/03/2022//Worked on outline for better OOP understanding (Located on GDrive: DigiKhet Program Design)
-    -04/11/2022//Entire redesign based on outline
-        -Gamepieces will only hold internal information for standard play (may hold external location info when AI implemented)
-            -No more complex reflection matrices, simple cardinal direction dictionary
-        -Board holds all Gamepiece information for pieces present
-        -Laser attached to Sphinx class (attribute of Sphinx in Khet 2.0)
-            -Will return location of wall or hit gamepiece
-        -Player class simple dataclass containing name and color
-        -Curator manages all turn-based states and actions
-    -04/13/2022//Completed initial abstract base class for Gamepieces
-    -04/16/2022//Completed Sphinx Gamepiece child class
-    -04/17/2022//Started initial Laser class development, sidelining beam() method until Board development
-    -04/21/2022//Started Board development
-    -04/23/2022//Continued Board development, made Player dataclass
-        - Completed init method (aside from loading default state file)
-        - Completed structure for get_state method
-        - Completed set_state method
-    -04/24/2022//Completed board development and Gamepieces development, continued Laser development
-    -04/25/2022//Completed Laser development
-    -04/27/2022//Made simple outline for Curator class, updated Program Goals
-'''
-
-from abc import ABC, abstractmethod
-from dataclasses import dataclass
-
-@dataclass
-class Player:
-    '''Retains player metadata'''
-    name: str
-    color: str
-
-    def __str__(self):
-        '''Returns name when printed'''
-        return self.name
-
-class Gamepiece(ABC):
-    '''
-    Abstract base dataclass for gamepieces. Stores player affiliation, movement 
-    ruleset, and reflection data.
-    '''
-    @abstractmethod
-    def __init__(self, player : Player):
-        self.player = player # player association
-        self._can_move = True
-        self._can_rotate = True
-        pass #abs method
-
-    @property
-    def name(self):
-        return self.__class__.__name__ #return name of Gamepiece type (Sphinx, Anubis, etc.)
-
-    @property
-    def player(self):
-        return self.player #return player
-
-    @property
-    def can_move(self):
-        return self._can_move
-    
-    @property
-    def can_rotate(self):
-        return self._can_rotate
-
-    @property
-    def reflect_state(self):
-        return self._reflect_state #return reflect state for Gamepiece (N, E, S, W)
-
-    @reflect_state.setter
-    def reflect_state(self, state: list): #set gamepiece reflect state (N, E, S, W)
-        assert(len(state)==4) #throws error if not length 4 (invalid state)
-        self._reflect_state = state #sets state
-
-    def __call__(self, rank: int, file: int) -> str:
-        '''
-        Object can be called while providing a location to store it internally within the Gamepiece.
-        Will be useful in AI features.
-        '''
-        self.location = (rank, file)
-        return f'Location: rank {rank}, file {file} stored in {self.name} data.'
-
-    def __str__(self) -> str:
-        '''
-        Return gamepiece name when printed.
-        '''
-        return self.__class__.__name__
-
-class Sphinx(Gamepiece):
-    '''
-    Gamepiece child class for Sphinx Gamepiece.
-    Sphinx is stationary, and has limited rotation capabilities.
-    '''
-    VALID_STATES = ('Block','Block','Block','Block') #Only valid reflect state for Sphinx
-    VALID_FACES_FOR = {'Red': ('S','E'), 'Silver': ('N','W')}
-
-    def __init__(self, player : Player, face = None):
-        '''
-        Initialize gamepiece for Sphinx. Ignores location parameter.
-        Sphinx placed based on faction.
-        '''
-        super.__init__(player)
-        default_face = self.VALID_FACES_FOR[player][0] #default face for direction of laser
-        self._face = face if face in self.VALID_FACES_FOR[player] else default_face
-        self._laser = Laser(self._face)
-        self._can_move = False
-        self._reflect_state = self.VALID_STATES
-
-    @property
-    def laser(self):
-        return self._laser
-
-class Pharaoh(Gamepiece):
-    '''
-    The 'King' in Khet. Player loses when this is removed. Removed when hit.
-    Can't rotate    
-    '''
-    VALID_STATES = ('Hit','Hit','Hit','Hit')
-    def __init__(self, player : Player):
-        super.__init__(player)
-        self._can_rotate = False
-        self._reflect_state = self.VALID_STATES #only valid state
-
-class Scarab(Gamepiece):
-    '''
-    Only immortal Gamepiece. Can't be removed due to reflection on all sides.
-    Two valid states for reflection.
-    '''
-    VALID_STATES = (('E','N','W','S'),('W','S','E','N'))
-    def __init__(self, player : Player, state = None):
-        super.__init__(player)
-        self._reflect_state = state if state in self.VALID_STATES else self.VALID_STATES[0] #sets state if valid passed, else default
-
-class Pyramid(Gamepiece):
-    VALID_STATES = (('E','N','Hit','Hit'),('Hit','S','E','Hit'),('Hit','Hit','W','S'),('W','Hit','Hit','N'))
-    def __init__(self, player : Player, state = None):
-        super.__init__(player)
-        self._reflect_state = state if state in self.VALID_STATES else self.VALID_STATES[0] #sets state if valid passed, else default
-
-class Anubis(Gamepiece):
-    VALID_STATES = (('Block','Hit','Hit','Hit'),('Hit','Block','Hit','Hit'),('Hit','Hit','Block','Hit'),('Hit','Hit','Hit','Block'))
-    def __init__(self, player : Player, state = None):
-        super.__init__(player)
-        self._reflect_state = state if state in self.VALID_STATES else self.VALID_STATES[0] #sets state if valid passed, else default
-
-class Board:
-    '''
-        Game board. Initialized with number of ranks (rows) and files (columns).
-        If exclusive_zones is True, maintains list of locations exclusive to each player
-        If default_state_file is passed, loads from file
-    '''
-    def __init__(self, ranks = 8, files = 10, exclusive_zones = True, default_state_file = None):
-        self.MAX_RANK = max(range(ranks)) #height of board
-        self.MAX_FILE = max(range(files)) #width of board
-        self.board_state = dict() #board state Dict
-        self.exc_zones = dict() #exclusion zone Dict {player : zones}
-        if exclusive_zones:
-            #exclusive files (on own side of board)
-            home_files = {
-                'Red'    : [(rank,0) for rank in range(ranks)],
-                'Silver' : [(rank,self.MAX_FILE) for rank in range(ranks)]
-            }
-            #exclusive cells (on enemy side of board)
-            away_cells = {
-                'Red'    : [(self.MAX_RANK,self.MAX_FILE-1),(0,self.MAX_FILE-1)],
-                'Silver' : [(0+1,self.MAX_RANK),(0+1,0)]
-            }
-            for player in home_files:
-                if player in away_cells:
-                    self.exc_zones[player] = home_files[player] + away_cells[player]
-                else:
-                    pass
-        if default_state_file:
-            self.board_state = default_state_file #TODO: load dict from csv
-        for rank in range(ranks):
-            for file in range(files):
-                self.board_state[(rank, file)] = None
-
-    def get_state(self, location = None, gamepiece_type = None, player = None):
-        '''
-        Get state of Board based on supplied parameters. If a location is supplied, return value will be Gamepiece or None.
-        If location isn't supplied, return value will be list of tuples (rank,file) or None
-        TODO: Find a way to make more elegant than if-elif-else (and sort more logically)
-        '''
-        gamepiece_match = self.board_state[location].name == gamepiece_type if location else False
-        player_match = self.board_state[location].player == player if location else False
-        if gamepiece_type and player and location:
-            #return Gamepiece if same type, of player, and at location
-            return self.board_state[location] if gamepiece_match and player_match else None
-        elif gamepiece_type and location:
-            #return Gamepiece if at type at location
-            return self.board_state[location] if gamepiece_match else None
-        elif player and location:
-            #return Gamepiece if owned by player at location
-            return self.board_state[location] if player_match else None
-        elif location:
-            #returns Gamepiece or None if location empty
-            return self.board_state[location]
-        elif gamepiece_type and player:
-            #return locations of gamepieces owned by player
-            return [loc for loc in self.board_state.keys() if (self.board_state[loc].player == player) and (self.board_state[loc].name == gamepiece_type)]
-        elif gamepiece_type:
-            #return locations of gamepieces of that type
-            return [loc for loc in self.board_state.keys() if self.board_state[loc].name == gamepiece_type]
-        elif player:
-            #return locations of gamepieces owned by player
-            return [loc for loc in self.board_state.keys() if self.board_state[loc].player == player]
-        else:
-            #returns board state
-            return self.board_state
-
-    def set_state(self, location : tuple, gamepiece : Gamepiece):
-        self.board_state[location] = gamepiece
-
-class Laser:
-    '''
-    Class for laser operation.
-    '''
-    #Matrix to use in beam calculations: Direction : Sphinx Location, Offset to Next Beam Location
-    #implies standard board size, TODO: make agnostic of board size
-
-    #(Sphinx direction: (Sphinx location, movement offset, end of rank/file in direction, opposite direction index)
-    LOCATION_DIRECTION_MATRIX = {
-        'N': ((7, 9), (-1, 0), (0, 10), 2),
-        'E': ((0, 0), (0,  1), (0, 10), 3),
-        'S': ((0, 0), (1,  0), (8, 0), 0),
-        'W': ((7, 9), (0, -1), (8, 0), 1)
-        }
-    def __init__(self, direction):
-        self._initial_direction = direction
-        self._last_beam = None
-    
-    def beam(self, board : Board):
-        '''
-        Uses board_state and initial direction to generate laserbeam path on board.
-        Returns location of hit gamepiece, or wall indication
-        ''' 
-        direction = self._initial_direction # set initial direction based on direction Sphinx is facing
-        location = self.LOCATION_DIRECTION_MATRIX[direction][0] # set initial location to be Sphinx
-        location_list = []
-        #infinite loop until function returns value, repeats per direction
-        while(True):
-            movement = self.LOCATION_DIRECTION_MATRIX[direction][1] #store step direction
-            wall = self.LOCATION_DIRECTION_MATRIX[direction][2] #store wall at end of rank/file in direction
-            oppo_idx = self.LOCATION_DIRECTION_MATRIX[direction][3] #store side of gamepiece laser will hit
-            while location is not wall: #loop until location hits wall
-                location_list.append(location) #store list of locations laser hit
-                loc_state = board.get_state(location) #fetch Gamepiece if at location
-                if loc_state is Gamepiece: #if Gamepiece at location
-                    state = loc_state.reflect_state[oppo_idx] #fetch gamepiece interaction result
-                    if state in self.LOCATION_DIRECTION_MATRIX: #if a reflection direction
-                        direction = state #make new direction
-                        break #inner while loop
-                    else: #else if hit or block
-                        self._last_beam = location_list #store location list for beam
-                        return location, state #return location and state
-                else: 
-                    location = tuple(sum(coords) for coords in zip(location,movement)) #go to next location
-            if location is wall:
-                self._last_beam = location_list #store location list for beam
-                return wall #return wall location
-
-class GUI:
-    pass
-    #init based on Board size and state
-    #rank by file grid size, alternating colors (how to implement?)
-    #status section
-        #list both player names
-            #highlight whose turn it is
-        #move / rotate buttons (grayed out if gamepiece not selected)
-        #big red circle with BEAM for pressing laser beam (gray when not applicable)
-    #players gamepieces colored based on their color
-    #laser generation function (arg: beam locations)
-        #line through cell for each location (H line for laser E/W, V line for N/S)
-        #when reflected on gamepiece, change cell to red
-
-def Curator():
-    #initialize Board with default state
-    gameboard = Board(default_state_file='<REPLACE>.csv') #will have gamepieces that have Player affiliation. May need to discuss 
-    #initialize Players (perform twice)
-        #request player username (PNAME = <textfieldobjectname>.get('1.0','end-1c'))
-        #generate Player with username and color ('red','silver')
-    #loop for turn while win state is false
-        #requests player action
-            #click gamepiece on GUI, select action (Move/Rotate), select subaction (direction of movement or rotation)
-        #validate then perform action
-            #update GUI
-        #wait for Player to press beam on GUI
-            #update GUI
-        #retrieve beam return (either wall location, or gamepiece location and state)
-        #remove gamepiece if 'Hit'
-        #check win state
-    pass
-
-
-
-def debug():
-    '''
-    Debug Interface: uncomment if __name__ statement to activate debug interface
-    '''
-    pass
-
-if __name__ == '__main__': 
-    debug()
-
-'''
-    Rules Dump from wikipedia:
-    Each player starts the game with 14 playing pieces (12 in Deflexion) on a 10x8 board, arranged in one of several predefined configurations, and a laser. The board has some squares (right file, left corners) that are restricted to pieces of one side or the other, preventing the creation of impenetrable fortress positions. In the original game, the lasers were built into the gameboard; in the "Khet 2.0" version, the lasers are instead built into two extra Sphinx playing pieces, which can be rotated as a player's turn even though they cannot be moved from their starting positions. Scarab (formerly "Djed") and Pyramid pieces have mirrors (one on the Pyramid, and two on the Scarab) positioned such that when the laser beam strikes a reflective side, it reflects at a 90° angle. Players try to position pieces in a fashion that allows the laser beam to reflect into the opponent's Pharaoh, thus winning the game; however, they must also try to protect their own Pharaoh from being struck by the laser beam at the same time. On each turn, a player either moves a piece one square in any direction, or rotates a piece 90 degrees clockwise or counterclockwise. After moving, the player must fire his or her laser, and any piece of either color hit on a non-reflecting side is removed from play.
-    The pieces in the game are:
-    Pharaoh (1 of each color)
-        The Pharaoh is the most important piece for each side. If hit with a laser, it is destroyed and its owner loses the game. Similar to a king in chess, the Pharaoh pieces are comparatively weak, and so are often not moved unless under duress.
-    Scarab/Djed (2 of each color)
-        Scarabs (formerly called Djeds) consist primarily of large, dual-sided mirrors. They reflect a laser coming in from any direction, and thus cannot be eliminated from the board. Also, unlike other pieces, Scarabs may move into an adjacent square even if it is already occupied, by switching places with the piece found there (whichever color it may be). Thus, they are the most powerful pieces on the board, but must be used with care, as a move that puts one side of the mirror in a favorable position may expose the player to attack using the opposite side of the same mirror.
-    Pyramid (7 of each color)
-        Pyramids have a single diagonal mirror, and form the primary mechanism for directing the path of the laser. They are vulnerable to a hit from two of the four sides, and must be defended lest the player lose their ability to build paths of any size.
-    Obelisk (2 in Deflexion, 4 in Khet 1, not in Khet 2)
-        Large pillars with no mirrored sides, these are vulnerable to attack from any direction, and therefore useful mostly as an emergency sacrifice to protect another piece (such as the Pharaoh). In Khet 1, each player starts the game with four obelisks each; a laser hit always removes an obelisk.
-    Anubis (2 in Khet 2 only)
-        Anubis replaced Obelisks in Khet 2.0; they have the advantage that, despite still being unmirrored, they are not affected by a laser strike on the front; they must be hit on the sides or rear in order to be eliminated.
-    Sphinx (1 of each color)
-        In Khet 2.0, the Sphinxes hold the lasers. They may not move (each player's is located at their closest right-hand corner) but may be rotated in place so as to fire down the rank instead of the file. A Sphinx is unaffected by laser fire, whether the opponent's or its own reflected back upon itself.
-    Three opening setups are most commonly used: Classic, which is the standard starting configuration, and is the best setup for one's first time playing; Imhotep, which is a variation on the Classic setup that introduces new defensive possibilities; and Dynasty, which has a fairly even mix of offense and defense, and moves quickly. However, any configuration agreed upon by both players can be used. In Deflexion, half the pieces were gold, and half were silver. When the company changed the name to Khet, the gold pieces were changed to red. In Deflexion, gold always goes first, and in Khet, silver always goes first.
-'''
+'''                                                                     
+88888888ba,    88               88  88      a8P   88                                
+88      `"8b   ""               ""  88    ,88'    88                         ,d     
+88        `8b                       88  ,88"      88                         88     
+88         88  88   ,adPPYb,d8  88  88,d88'       88,dPPYba,    ,adPPYba,  MM88MMM  
+88         88  88  a8"    `Y88  88  8888"88,      88P'    "8a  a8P_____88    88     
+88         8P  88  8b       88  88  88P   Y8b     88       88  8PP"""""""    88     
+88      .a8P   88  "8a,   ,d88  88  88     "88,   88       88  "8b,   ,aa    88,    
+88888888Y"'    88   `"YbbdP"Y8  88  88       Y8b  88       88   `"Ybbd8"'    "Y888  
+                    aa,    ,88                                                      
+                     "YbbbdP" 
+
+A digital version of one of my favorite childhood board games: Khet - the Laser Board Game!
+By:  Blake McGill
+Last Revision: 10/18/2026
+
+Goals:
+    Phase One: implement base game with simple tkinter GUI for local play
+    Phase Two: implement base game with Raspberry Pi dedicated web server for online/network play
+        -Pass game state to webpage generation script
+        -Use HTML/CSS/JS to generate webpage based on game state
+    Phase Three: implement AI for playing against computer
+        -Use evaluation dunder methods (__ge__, __eq_, etc.) for programmatic AI implementation
+        -Use neural network algorithms for advanced AI
+
+Log:
+    -03/01/2021//Set up classes and brief explanation for some. Added rules dump and goals. Started Gamepiece class.
+    -03/07/2021//Created PieceSide dataclass as the value for each gamepiece's side. Created debug interface to test classes.
+    -03/08/2021//Updated comments, docstrings, added them where possible, continuing gamepiece class development.
+    -02/20/2022//Replaced method for reflection of laser when it interacts with gamepiece (new-> ReflectMatrix)
+    -04/03/2022//Worked on outline for better OOP understanding (Located on GDrive: DigiKhet Program Design)
+    -04/11/2022//Entire redesign based on outline
+        -Gamepieces will only hold internal information for standard play (may hold external location info when AI implemented)
+            -No more complex reflection matrices, simple cardinal direction dictionary
+        -Board holds all Gamepiece information for pieces present
+        -Laser attached to Sphinx class (attribute of Sphinx in Khet 2.0)
+            -Will return location of wall or hit gamepiece
+        -Player class simple dataclass containing name and color
+        -Curator manages all turn-based states and actions
+    -04/13/2022//Completed initial abstract base class for Gamepieces
+    -04/16/2022//Completed Sphinx Gamepiece child class
+    -04/17/2022//Started initial Laser class development, sidelining beam() method until Board development
+    -04/21/2022//Started Board development
+    -04/23/2022//Continued Board development, made Player dataclass
+        - Completed init method (aside from loading default state file)
+        - Completed structure for get_state method
+        - Completed set_state method
+    -04/24/2022//Completed board development and Gamepieces development, continued Laser development
+    -04/25/2022//Completed Laser development
+    -04/27/2022//Made simple outline for Curator class, updated Program Goals
+    -10/18/2026//Board rework for engine speed
+        - Gamepieces use __slots__ and pack into one byte cell codes (type, owner, orientation)
+        - Board stores a flat bytearray of cell codes indexed by rank*files+file
+        - Per-player, per-type, and Pharaoh location indexes kept up to date by set_state
+        - Geometry precomputes ray tables once per board size, Laser follows rays piece to piece
+            -Laser no longer tied to the standard 10x8 board, fires from its Sphinx wherever it is
+        - Laser caches its last path, Board.set_state invalidates it from the first changed cell
+    -10/18/2026//Legal move generation
+        - Integer encoded moves, Board.generate_moves respects exclusive zones, Scarab swaps, Sphinx faces
+        - Board.make_move/unmake_move play and undo full turns in place (move, laser, removal), perft for validation
+        - Fixed Silver exclusive corner cells
+    -10/18/2026//Started Phase Three AI
+        - Board keeps an incremental Zobrist hash (Gamepiece, owner, reflect state, side to move)
+        - Searcher: iterative deepening alpha-beta with transposition table, killer moves, history ordering
+        - batch_beam traces both lasers over a NumPy batch of positions for neural network training data
+        - Classic, Imhotep and Dynasty setups, Curator turn loop (validate, apply, beam, removal, win check)
+        - Headless self-play tournaments over a process pool, results streamed to a JSON lines file
+    -10/18/2026//Loading states (finally)
+        - Fixed-width binary positions (one byte per cell and side to move), Board loads setups, binary, or CSV files
+        - GameDatabase: append-only game records read through mmap with an offset index
+    -10/18/2026//Started Phase Two network play
+        - asyncio GameServer hosts many games per process, sends changed cells and laser path after each turn
+    -10/18/2026//Benchmark suite (python Khet.py bench), JSON results can be compared against a baseline
+    -10/18/2026//Opt-in Metrics instrumentation (beam, get_state, move generation, search, Curator turn phases)
+        - Snapshot dict or Prometheus text, sampling profiler hook around single turns
+    -10/18/2026//ThreatMap: reverse laser chains from each Pharaoh for fast exposure and immediate win checks
+    -10/18/2026//Text engine protocol (python Khet.py engine) with time controls and pondering, no GUI needed
+    -10/18/2026//Opening book for the standard setups (python Khet.py book), used by the engine with --book
+'''
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+import random
+import struct
+import time
+
+#Cardinal directions, index matches position within a reflect state (N, E, S, W)
+DIRECTIONS = ('N', 'E', 'S', 'W')
+DIRECTION_INDEX = {direction: idx for idx, direction in enumerate(DIRECTIONS)}
+#Gamepiece type ids used in compact cell codes (0 reserved for empty cell)
+PIECE_TYPES = (None, 'Sphinx', 'Pharaoh', 'Scarab', 'Pyramid', 'Anubis')
+PLAYER_COLORS = ('Red', 'Silver')
+
+@dataclass
+class Player:
+    '''Retains player metadata'''
+    name: str
+    color: str
+
+    def __str__(self):
+        '''Returns name when printed'''
+        return self.name
+
+def _color(player) -> str:
+    '''Normalize a Player or color string to the color string used as key throughout the Board'''
+    return player.color if isinstance(player, Player) else player
+
+class Gamepiece(ABC):
+    '''
+    Abstract base dataclass for gamepieces. Stores player affiliation, movement 
+    ruleset, and reflection data.
+    Every Gamepiece packs into a one byte cell code: type id (3 bits), owner (1 bit), orientation (2 bits)
+    '''
+    __slots__ = ('_player', '_can_move', '_can_rotate', '_reflect_state', 'location')
+    TYPE_ID = 0 #index into PIECE_TYPES, set by child classes
+
+    @abstractmethod
+    def __init__(self, player : Player):
+        self._player = _color(player) # player association (color)
+        self._can_move = True
+        self._can_rotate = True
+        self.location = None
+
+    @property
+    def name(self):
+        return self.__class__.__name__ #return name of Gamepiece type (Sphinx, Anubis, etc.)
+
+    @property
+    def player(self):
+        return self._player #return player
+
+    @property
+    def can_move(self):
+        return self._can_move
+    
+    @property
+    def can_rotate(self):
+        return self._can_rotate
+
+    @property
+    def reflect_state(self):
+        return self._reflect_state #return reflect state for Gamepiece (N, E, S, W)
+
+    @reflect_state.setter
+    def reflect_state(self, state: list): #set gamepiece reflect state (N, E, S, W)
+        assert(len(state)==4) #throws error if not length 4 (invalid state)
+        self._reflect_state = tuple(state) #sets state
+
+    @property
+    def orientation(self) -> int:
+        '''Index of current reflect state within VALID_STATES (0 for single state Gamepieces)'''
+        if isinstance(self.VALID_STATES[0], tuple):
+            return self.VALID_STATES.index(self._reflect_state)
+        return 0
+
+    @orientation.setter
+    def orientation(self, orientation: int):
+        if isinstance(self.VALID_STATES[0], tuple):
+            self._reflect_state = self.VALID_STATES[orientation]
+
+    @property
+    def code(self) -> int:
+        '''Compact cell code stored by Board'''
+        return (self.TYPE_ID << 3) | (PLAYER_COLORS.index(self._player) << 2) | self.orientation
+
+    @staticmethod
+    def from_code(code: int):
+        '''Build a new Gamepiece from a cell code. Returns None for an empty cell'''
+        if not code:
+            return None
+        piece = PIECE_CLASSES[code >> 3](PLAYER_COLORS[(code >> 2) & 1])
+        piece.orientation = code & 3
+        return piece
+
+    def __call__(self, rank: int, file: int) -> str:
+        '''
+        Object can be called while providing a location to store it internally within the Gamepiece.
+        Will be useful in AI features.
+        '''
+        self.location = (rank, file)
+        return f'Location: rank {rank}, file {file} stored in {self.name} data.'
+
+    def __str__(self) -> str:
+        '''
+        Return gamepiece name when printed.
+        '''
+        return self.__class__.__name__
+
+class Sphinx(Gamepiece):
+    '''
+    Gamepiece child class for Sphinx Gamepiece.
+    Sphinx is stationary, and has limited rotation capabilities.
+    Orientation is the index of the facing direction in DIRECTIONS.
+    '''
+    __slots__ = ('_face', '_laser')
+    TYPE_ID = 1
+    VALID_STATES = ('Block','Block','Block','Block') #Only valid reflect state for Sphinx
+    VALID_FACES_FOR = {'Red': ('S','E'), 'Silver': ('N','W')}
+
+    def __init__(self, player : Player, face = None):
+        '''
+        Initialize gamepiece for Sphinx. Ignores location parameter.
+        Sphinx placed based on faction.
+        '''
+        super().__init__(player)
+        default_face = self.VALID_FACES_FOR[self._player][0] #default face for direction of laser
+        self._face = face if face in self.VALID_FACES_FOR[self._player] else default_face
+        self._laser = Laser(self._face, self._player)
+        self._can_move = False
+        self._reflect_state = self.VALID_STATES
+
+    @property
+    def face(self):
+        return self._face
+
+    @property
+    def orientation(self) -> int:
+        return DIRECTION_INDEX[self._face]
+
+    @orientation.setter
+    def orientation(self, orientation: int):
+        self._face = DIRECTIONS[orientation]
+        self._laser._initial_direction = self._face
+
+    @property
+    def laser(self):
+        return self._laser
+
+class Pharaoh(Gamepiece):
+    '''
+    The 'King' in Khet. Player loses when this is removed. Removed when hit.
+    Can't rotate    
+    '''
+    __slots__ = ()
+    TYPE_ID = 2
+    VALID_STATES = ('Hit','Hit','Hit','Hit')
+    def __init__(self, player : Player):
+        super().__init__(player)
+        self._can_rotate = False
+        self._reflect_state = self.VALID_STATES #only valid state
+
+class Scarab(Gamepiece):
+    '''
+    Only immortal Gamepiece. Can't be removed due to reflection on all sides.
+    Two valid states for reflection.
+    '''
+    __slots__ = ()
+    TYPE_ID = 3
+    VALID_STATES = (('E','N','W','S'),('W','S','E','N'))
+    def __init__(self, player : Player, state = None):
+        super().__init__(player)
+        self._reflect_state = state if state in self.VALID_STATES else self.VALID_STATES[0] #sets state if valid passed, else default
+
+class Pyramid(Gamepiece):
+    __slots__ = ()
+    TYPE_ID = 4
+    VALID_STATES = (('E','N','Hit','Hit'),('Hit','S','E','Hit'),('Hit','Hit','W','S'),('W','Hit','Hit','N'))
+    def __init__(self, player : Player, state = None):
+        super().__init__(player)
+        self._reflect_state = state if state in self.VALID_STATES else self.VALID_STATES[0] #sets state if valid passed, else default
+
+class Anubis(Gamepiece):
+    __slots__ = ()
+    TYPE_ID = 5
+    VALID_STATES = (('Block','Hit','Hit','Hit'),('Hit','Block','Hit','Hit'),('Hit','Hit','Block','Hit'),('Hit','Hit','Hit','Block'))
+    def __init__(self, player : Player, state = None):
+        super().__init__(player)
+        self._reflect_state = state if state in self.VALID_STATES else self.VALID_STATES[0] #sets state if valid passed, else default
+
+#Gamepiece class per type id (index 0 is an empty cell)
+PIECE_CLASSES = (None, Sphinx, Pharaoh, Scarab, Pyramid, Anubis)
+
+#Beam outcomes: indexes 0-3 are a new travel direction, then Hit and Block
+OUTCOMES = DIRECTIONS + ('Hit', 'Block')
+HIT = OUTCOMES.index('Hit')
+BLOCK = OUTCOMES.index('Block')
+
+#Move kinds. Moves are packed into integers: kind << 24 | to cell << 12 | from cell
+MOVE_STEP = 0 #move to adjacent empty cell
+MOVE_SWAP = 1 #Scarab swaps places with adjacent Pyramid or Anubis
+MOVE_CW = 2 #rotate 90 degrees clockwise (to cell equals from cell)
+MOVE_CCW = 3 #rotate 90 degrees counterclockwise
+
+def encode_move(kind : int, from_idx : int, to_idx : int) -> int:
+    '''Pack a move into an integer'''
+    return (kind << 24) | (to_idx << 12) | from_idx
+
+def decode_move(move : int) -> tuple:
+    '''Unpack an integer move into (kind, from cell index, to cell index)'''
+    return move >> 24, move & 0xFFF, (move >> 12) & 0xFFF
+
+def _build_reflect_table():
+    '''
+    Outcome of a beam travelling in each direction (N, E, S, W) into a cell, per cell code.
+    Empty and unused codes let the beam pass in its travel direction.
+    '''
+    table = [(0, 1, 2, 3)] * 64
+    for code in range(64):
+        gamepiece_class = PIECE_CLASSES[code >> 3] if (code >> 3) < len(PIECE_CLASSES) else None
+        if gamepiece_class is None:
+            continue
+        states = gamepiece_class.VALID_STATES
+        if isinstance(states[0], tuple):
+            if (code & 3) >= len(states):
+                continue
+            states = states[code & 3]
+        #beam travelling in direction d hits the side opposite to d
+        table[code] = tuple(OUTCOMES.index(states[(travel + 2) % 4]) for travel in range(4))
+    return tuple(table)
+
+REFLECT_TABLE = _build_reflect_table()
+#REVERSE_TABLE[code][direction]: travel direction into the cell that reflects out in direction, -1 if none
+REVERSE_TABLE = tuple(
+    tuple(next((travel for travel in range(4) if code and REFLECT_TABLE[code][travel] == out), -1) for out in range(4))
+    for code in range(64))
+
+class Geometry:
+    '''
+    Precomputed cell geometry for a board size, shared by every Board with the same (ranks, files).
+    rays[idx*4 + direction] holds the cell indexes from the cell after idx up to the wall, in order.
+    walls[idx*4 + direction] holds the off-board location a beam leaving that ray reaches.
+    neighbors[idx] holds the up to eight cell indexes adjacent to idx.
+    zobrist[idx*64 + code] holds the Zobrist key of a cell code at idx (0 for an empty cell),
+    side_key is mixed in while Red is to move.
+    '''
+    __slots__ = ('ranks', 'files', 'cells', 'coords', 'index', 'rays', 'walls', 'neighbors', 'zobrist', 'side_key')
+    STEPS = ((-1, 0), (0, 1), (1, 0), (0, -1)) #(rank, file) offset per direction (N, E, S, W)
+    _cache = dict()
+
+    @classmethod
+    def of(cls, ranks : int, files : int):
+        '''Returns the shared Geometry for (ranks, files), building it on first use'''
+        geometry = cls._cache.get((ranks, files))
+        if geometry is None:
+            geometry = cls._cache[(ranks, files)] = cls(ranks, files)
+        return geometry
+
+    def __init__(self, ranks : int, files : int):
+        self.ranks = ranks
+        self.files = files
+        self.cells = ranks * files
+        self.coords = tuple((rank, file) for rank in range(ranks) for file in range(files)) #cell index -> location
+        self.index = {location: idx for idx, location in enumerate(self.coords)} #location -> cell index
+        rays = []
+        walls = []
+        for rank, file in self.coords:
+            for d_rank, d_file in self.STEPS:
+                ray = []
+                r, f = rank + d_rank, file + d_file
+                while 0 <= r < ranks and 0 <= f < files:
+                    ray.append(r * files + f)
+                    r, f = r + d_rank, f + d_file
+                rays.append(tuple(ray))
+                walls.append((r, f))
+        self.rays = tuple(rays)
+        self.walls = tuple(walls)
+        self.neighbors = tuple(
+            tuple((rank + d_rank) * files + file + d_file
+                  for d_rank in (-1, 0, 1) for d_file in (-1, 0, 1)
+                  if (d_rank or d_file) and 0 <= rank + d_rank < ranks and 0 <= file + d_file < files)
+            for rank, file in self.coords)
+        keys = random.Random(ranks * 1000 + files) #fixed seed, hashes are stable between runs and processes
+        self.zobrist = tuple(keys.getrandbits(64) if code else 0 for idx in range(self.cells) for code in range(64))
+        self.side_key = keys.getrandbits(64)
+
+class Board:
+    '''
+        Game board. Initialized with number of ranks (rows) and files (columns).
+        If exclusive_zones is True, maintains list of locations exclusive to each player
+        If default_state_file is passed, loads from file
+
+        Cells are stored as a flat bytearray of Gamepiece codes indexed by rank*files+file, alongside
+        the Gamepiece objects themselves. Locations per player, per type, and each player's Pharaoh
+        are kept up to date by set_state so location queries never scan the whole board.
+        To rotate a Gamepiece already on the Board, set_state it again so its code is refreshed.
+    '''
+    def __init__(self, ranks = 8, files = 10, exclusive_zones = True, default_state_file = None):
+        self.RANKS = ranks
+        self.FILES = files
+        self.MAX_RANK = max(range(ranks)) #height of board
+        self.MAX_FILE = max(range(files)) #width of board
+        self.geometry = Geometry.of(ranks, files) #shared ray tables for this board size
+        self._cells = bytearray(self.geometry.cells) #Gamepiece code per cell, 0 when empty
+        self._pieces = [None] * self.geometry.cells #Gamepiece per cell
+        self._coords = self.geometry.coords #cell index -> location
+        self._index = self.geometry.index #location -> cell index
+        self._player_locs = {player: set() for player in PLAYER_COLORS} #cell indexes of each player's Gamepieces
+        self._type_locs = {name: set() for name in PIECE_TYPES[1:]} #cell indexes of each Gamepiece type
+        self._pharaoh = {player: None for player in PLAYER_COLORS} #cell index of each player's Pharaoh
+        self._sphinx = {player: None for player in PLAYER_COLORS} #cell index of each player's Sphinx
+        self._observers = [] #objects with invalidate(board, idx), told about every changed cell
+        self.exc_zones = dict() #exclusion zone Dict {player : zones}
+        if exclusive_zones:
+            #exclusive files (on own side of board)
+            home_files = {
+                'Red'    : [(rank,0) for rank in range(ranks)],
+                'Silver' : [(rank,self.MAX_FILE) for rank in range(ranks)]
+            }
+            #exclusive cells (on enemy side of board)
+            away_cells = {
+                'Red'    : [(self.MAX_RANK,self.MAX_FILE-1),(0,self.MAX_FILE-1)],
+                'Silver' : [(0,0+1),(self.MAX_RANK,0+1)]
+            }
+            for player in home_files:
+                if player in away_cells:
+                    self.exc_zones[player] = home_files[player] + away_cells[player]
+                else:
+                    pass
+        #cells each player's Gamepieces may not enter (exclusive to another player)
+        self._forbidden = {player: bytearray(self.geometry.cells) for player in PLAYER_COLORS}
+        for owner, zones in self.exc_zones.items():
+            for location in zones:
+                for player, forbidden in self._forbidden.items():
+                    if player != owner:
+                        forbidden[self._index[location]] = 1
+        self._to_move = 'Silver' #side to move, Silver always goes first in Khet
+        self.hash = 0 #Zobrist hash of cell codes and side to move, kept up to date by _put and make_move
+        self._history = [] #(move, captured cell index, captured Gamepiece) per make_move
+        if default_state_file:
+            self.load_state_file(default_state_file)
+
+    def clear(self):
+        '''Remove every Gamepiece and turn history, Silver to move'''
+        for idx in range(self.geometry.cells):
+            if self._pieces[idx] is not None:
+                self._put(idx, None)
+        self._history.clear()
+        self.to_move = 'Silver'
+
+    def encode_position(self) -> bytes:
+        '''Fixed-width binary position: one Gamepiece code byte per cell, then side to move (PLAYER_COLORS index)'''
+        return bytes(self._cells) + bytes((PLAYER_COLORS.index(self._to_move),))
+
+    def decode_position(self, data):
+        '''Load a position from encode_position bytes (any bytes-like, e.g. a memoryview into a GameDatabase)'''
+        cells = self.geometry.cells
+        if len(data) != cells + 1:
+            raise ValueError(f'Position holds {len(data) - 1} cells, Board has {cells}')
+        for idx in range(cells):
+            if data[idx] != self._cells[idx]:
+                self._put(idx, Gamepiece.from_code(data[idx]))
+        self._history.clear()
+        self.to_move = PLAYER_COLORS[data[cells]]
+
+    def load_state_file(self, path : str):
+        '''
+        Load a state from a setup name (see SETUPS), a binary position file (see save_state_file),
+        or a CSV file with rank,file,gamepiece,player,orientation rows and an optional ',,to move,<player>,' row
+        (Silver to move without it).
+        '''
+        if path in SETUPS:
+            ranks, files, position = setup_position(path)
+        elif path.lower().endswith('.csv'):
+            import csv
+            self.clear()
+            with open(path, newline = '') as state_file:
+                for row in csv.DictReader(state_file):
+                    if row['gamepiece'] == 'to move':
+                        self.to_move = row['player']
+                        continue
+                    gamepiece = PIECE_CLASSES[PIECE_TYPES.index(row['gamepiece'])](row['player'])
+                    gamepiece.orientation = int(row['orientation'])
+                    self.set_state((int(row['rank']), int(row['file'])), gamepiece)
+            return
+        else:
+            with open(path, 'rb') as state_file:
+                data = state_file.read()
+            magic, ranks, files = POSITION_HEADER.unpack_from(data)
+            if magic != POSITION_MAGIC:
+                raise ValueError(f'{path} is not a DigiKhet position file')
+            position = data[POSITION_HEADER.size:]
+        if (ranks, files) != (self.RANKS, self.FILES):
+            raise ValueError(f'{path} is for a {ranks}x{files} board')
+        self.decode_position(position)
+
+    def save_state_file(self, path : str):
+        '''Save the position as CSV if path ends with .csv, otherwise as a binary position file'''
+        if path.lower().endswith('.csv'):
+            import csv
+            with open(path, 'w', newline = '') as state_file:
+                writer = csv.writer(state_file)
+                writer.writerow(('rank', 'file', 'gamepiece', 'player', 'orientation'))
+                for idx in range(self.geometry.cells):
+                    gamepiece = self._pieces[idx]
+                    if gamepiece is not None:
+                        writer.writerow(self._coords[idx] + (gamepiece.name, gamepiece.player, gamepiece.orientation))
+                writer.writerow(('', '', 'to move', self._to_move, ''))
+            return
+        with open(path, 'wb') as state_file:
+            state_file.write(POSITION_HEADER.pack(POSITION_MAGIC, self.RANKS, self.FILES) + self.encode_position())
+
+    @property
+    def board_state(self):
+        '''Board state Dict {(rank, file) : Gamepiece or None}, built on request'''
+        return dict(zip(self._coords, self._pieces))
+
+    def _locations(self, indexes):
+        '''Locations (rank, file) of cell indexes in rank then file order'''
+        coords = self._coords
+        return [coords[idx] for idx in sorted(indexes)]
+
+    def get_state(self, location = None, gamepiece_type = None, player = None):
+        '''
+        Get state of Board based on supplied parameters. If a location is supplied, return value will be Gamepiece or None.
+        If location isn't supplied, return value will be list of tuples (rank,file) or None
+        '''
+        if location is not None:
+            gamepiece = self._pieces[self._index[location]]
+            if gamepiece is None:
+                return None
+            if gamepiece_type and gamepiece.name != gamepiece_type:
+                return None
+            if player and gamepiece.player != _color(player):
+                return None
+            #returns Gamepiece matching every supplied filter
+            return gamepiece
+        if gamepiece_type and player:
+            player = _color(player)
+            if gamepiece_type == 'Pharaoh':
+                #Pharaoh location is tracked directly
+                idx = self._pharaoh.get(player)
+                return [] if idx is None else [self._coords[idx]]
+            #return locations of gamepieces of that type owned by player
+            return self._locations(self._player_locs.get(player, set()) & self._type_locs.get(gamepiece_type, set()))
+        elif gamepiece_type:
+            #return locations of gamepieces of that type
+            return self._locations(self._type_locs.get(gamepiece_type, ()))
+        elif player:
+            #return locations of gamepieces owned by player
+            return self._locations(self._player_locs.get(_color(player), ()))
+        else:
+            #returns board state
+            return self.board_state
+
+    def add_observer(self, observer):
+        '''Register an object whose invalidate(board, idx) is called whenever a cell changes'''
+        if observer not in self._observers:
+            self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def set_state(self, location : tuple, gamepiece : Gamepiece):
+        '''Place Gamepiece (or None to clear) at location, keeping cell codes and indexes in sync'''
+        self._put(self._index[location], gamepiece)
+
+    def _put(self, idx : int, gamepiece : Gamepiece):
+        '''Place Gamepiece (or None) at cell index, updating all location indexes'''
+        for observer in self._observers:
+            observer.invalidate(self, idx)
+        zobrist = self.geometry.zobrist
+        self.hash ^= zobrist[(idx << 6) | self._cells[idx]]
+        old = self._pieces[idx]
+        if old is not None:
+            self._player_locs[old.player].discard(idx)
+            self._type_locs[old.name].discard(idx)
+            if old.TYPE_ID == Pharaoh.TYPE_ID and self._pharaoh[old.player] == idx:
+                self._pharaoh[old.player] = None
+            elif old.TYPE_ID == Sphinx.TYPE_ID and self._sphinx[old.player] == idx:
+                self._sphinx[old.player] = None
+            if old is not gamepiece and old.TYPE_ID == Sphinx.TYPE_ID:
+                old.laser.detach(self) #Sphinx left the Board, its Laser stops observing it
+        self._pieces[idx] = gamepiece
+        if gamepiece is None:
+            self._cells[idx] = 0
+            return
+        self._cells[idx] = code = gamepiece.code
+        self.hash ^= zobrist[(idx << 6) | code]
+        gamepiece.location = self._coords[idx]
+        self._player_locs[gamepiece.player].add(idx)
+        self._type_locs[gamepiece.name].add(idx)
+        if gamepiece.TYPE_ID == Pharaoh.TYPE_ID:
+            self._pharaoh[gamepiece.player] = idx
+        elif gamepiece.TYPE_ID == Sphinx.TYPE_ID:
+            self._sphinx[gamepiece.player] = idx
+
+    @property
+    def to_move(self):
+        '''Player (color) to move'''
+        return self._to_move
+
+    @to_move.setter
+    def to_move(self, player):
+        player = _color(player)
+        if player != self._to_move:
+            self.hash ^= self.geometry.side_key
+            self._to_move = player
+
+    @property
+    def winner(self):
+        '''Player whose opponent has lost their Pharaoh, or None while both Pharaohs stand'''
+        red, silver = self._pharaoh['Red'], self._pharaoh['Silver']
+        if red is None and silver is not None:
+            return 'Silver'
+        if silver is None and red is not None:
+            return 'Red'
+        return None
+
+    def generate_moves(self, player = None):
+        '''
+        Yields every legal move (integer encoded, see encode_move) for player, default side to move.
+        Respects exclusive zones, Scarab swaps, Sphinx facing limits, and the Pharaoh's no-rotate rule.
+        Nothing is yielded once a Pharaoh has been removed.
+        Board may be changed between moves as long as it is restored (make_move then unmake_move).
+        '''
+        player = _color(player) if player else self._to_move
+        if self._pharaoh['Red'] is None or self._pharaoh['Silver'] is None:
+            return
+        cells = self._cells
+        forbidden = self._forbidden[player]
+        neighbors = self.geometry.neighbors
+        for idx in sorted(self._player_locs[player]):
+            code = cells[idx]
+            type_id = code >> 3
+            if type_id == Sphinx.TYPE_ID:
+                #rotate between its two valid faces
+                faces = Sphinx.VALID_FACES_FOR[player]
+                orientation = code & 3
+                if DIRECTIONS[(orientation + 1) % 4] in faces:
+                    yield (MOVE_CW << 24) | (idx << 12) | idx
+                if DIRECTIONS[(orientation - 1) % 4] in faces:
+                    yield (MOVE_CCW << 24) | (idx << 12) | idx
+                continue
+            for target in neighbors[idx]:
+                if forbidden[target]:
+                    continue
+                target_code = cells[target]
+                if not target_code:
+                    yield (MOVE_STEP << 24) | (target << 12) | idx
+                elif type_id == Scarab.TYPE_ID and (target_code >> 3) in (Pyramid.TYPE_ID, Anubis.TYPE_ID) \
+                        and not self._forbidden[PLAYER_COLORS[(target_code >> 2) & 1]][idx]:
+                    yield (MOVE_SWAP << 24) | (target << 12) | idx
+            if type_id == Scarab.TYPE_ID:
+                #both rotations give the same Scarab state
+                yield (MOVE_CW << 24) | (idx << 12) | idx
+            elif type_id != Pharaoh.TYPE_ID:
+                yield (MOVE_CW << 24) | (idx << 12) | idx
+                yield (MOVE_CCW << 24) | (idx << 12) | idx
+
+    def move_to_text(self, move : int) -> str:
+        '''
+        Move in text notation: from and to cells as file letter and rank number (rank 1 on Silver's side),
+        e.g. 'e1e2' for a step or Scarab swap, 'e1+' / 'e1-' for a clockwise / counterclockwise rotation.
+        '''
+        kind, from_idx, to_idx = move >> 24, move & 0xFFF, (move >> 12) & 0xFFF
+        def cell(idx):
+            rank, file = self._coords[idx]
+            return f'{chr(ord("a") + file)}{self.RANKS - rank}'
+        if kind == MOVE_CW:
+            return cell(from_idx) + '+'
+        if kind == MOVE_CCW:
+            return cell(from_idx) + '-'
+        return cell(from_idx) + cell(to_idx)
+
+    def text_to_move(self, text : str) -> int:
+        '''Parse a move in move_to_text notation for the current position, ValueError if not legal'''
+        for move in self.generate_moves():
+            if self.move_to_text(move) == text:
+                return move
+        raise ValueError(f'Illegal move {text}')
+
+    def _rotate(self, idx : int, turn : int):
+        '''Rotate Gamepiece at cell idx by turn quarter turns (1 clockwise, -1 counterclockwise)'''
+        gamepiece = self._pieces[idx]
+        states = 2 if gamepiece.TYPE_ID == Scarab.TYPE_ID else 4
+        gamepiece.orientation = (gamepiece.orientation + turn) % states
+        self._put(idx, gamepiece)
+
+    def _apply(self, kind : int, from_idx : int, to_idx : int, undo = False):
+        '''Perform (or undo) the Gamepiece action of a move'''
+        pieces = self._pieces
+        if kind == MOVE_STEP:
+            if undo:
+                from_idx, to_idx = to_idx, from_idx
+            gamepiece = pieces[from_idx]
+            self._put(from_idx, None)
+            self._put(to_idx, gamepiece)
+        elif kind == MOVE_SWAP:
+            gamepiece, other = pieces[from_idx], pieces[to_idx]
+            self._put(from_idx, other)
+            self._put(to_idx, gamepiece)
+        else:
+            turn = 1 if kind == MOVE_CW else -1
+            self._rotate(from_idx, -turn if undo else turn)
+
+    def make_move(self, move : int):
+        '''
+        Play a full turn in place: perform the move for the side to move, fire its laser,
+        and remove a Gamepiece that is hit. Undo with unmake_move.
+        '''
+        self._apply(move >> 24, move & 0xFFF, (move >> 12) & 0xFFF)
+        captured_idx, captured = self._remove_hit(self.fire())
+        self._end_turn(move, captured_idx, captured)
+
+    def fire(self, player = None):
+        '''Fire the laser of player (default side to move). Returns Laser.beam result, None without a Sphinx'''
+        sphinx = self._sphinx[_color(player) if player else self._to_move]
+        if sphinx is None:
+            return None
+        return self._pieces[sphinx].laser.beam(self)
+
+    def _remove_hit(self, result):
+        '''Remove the Gamepiece a beam result hit. Returns (cell index, Gamepiece) removed or (-1, None)'''
+        if result is None or result[1] != 'Hit':
+            return -1, None
+        idx = self._index[result[0]]
+        captured = self._pieces[idx]
+        self._put(idx, None)
+        return idx, captured
+
+    def _end_turn(self, move : int, captured_idx : int, captured : Gamepiece):
+        '''Record the turn for unmake_move and pass play to the other side'''
+        self._history.append((move, captured_idx, captured))
+        self._to_move = 'Red' if self._to_move == 'Silver' else 'Silver'
+        self.hash ^= self.geometry.side_key
+
+    def unmake_move(self):
+        '''Undo the last make_move'''
+        move, captured_idx, captured = self._history.pop()
+        self._to_move = 'Red' if self._to_move == 'Silver' else 'Silver'
+        self.hash ^= self.geometry.side_key
+        if captured is not None:
+            self._put(captured_idx, captured)
+        self._apply(move >> 24, move & 0xFFF, (move >> 12) & 0xFFF, undo = True)
+
+    def perft(self, depth : int) -> int:
+        '''Count leaf positions of the legal move tree to depth, for validating move generation'''
+        if depth == 0:
+            return 1
+        nodes = 0
+        for move in self.generate_moves():
+            self.make_move(move)
+            nodes += self.perft(depth - 1)
+            self.unmake_move()
+        return nodes
+
+#Opening setups named after the Classic, Imhotep and Dynasty setups of the Khet 2.0 rulebook.
+#NON-STANDARD: these are approximations written without the rulebook diagrams to hand and have not been
+#checked against them. Piece counts are right (per side 1 Sphinx, 1 Pharaoh, 2 Scarabs, 7 Pyramids, 2 Anubis)
+#and layouts are point symmetric, but placements (Imhotep and Dynasty especially) and orientations (chosen so
+#neither opening laser removes a piece) may differ from the published setups. Games, tournament results and
+#opening books built from them aren't comparable with standard Khet until the layouts are checked.
+#Rank 0 (Red's side) first. Lowercase Red, uppercase Silver, '..' empty.
+#Letters: X Sphinx, P Pharaoh, S Scarab, Y Pyramid, A Anubis, followed by orientation
+#(index into VALID_STATES, facing direction index for Sphinx)
+SETUPS = {
+    'Classic': '''
+        x2 .. .. .. a2 p0 a2 y0 .. ..
+        .. .. y2 .. .. .. .. .. .. ..
+        .. .. .. Y1 .. .. .. .. .. ..
+        y0 .. Y3 .. s0 s0 .. y3 .. Y2
+        y0 .. Y1 .. S0 S0 .. y1 .. Y2
+        .. .. .. .. .. .. y3 .. .. ..
+        .. .. .. .. .. .. .. Y0 .. ..
+        .. .. Y2 A0 P0 A0 .. .. .. X0
+    ''',
+    'Imhotep': '''
+        x2 .. .. .. a2 p0 a2 s0 .. ..
+        .. .. y2 .. .. .. .. .. .. ..
+        .. .. y1 .. .. .. .. .. .. ..
+        y0 .. Y3 .. s0 y3 .. y0 .. Y3
+        y1 .. Y2 .. Y1 S0 .. y1 .. Y2
+        .. .. .. .. .. .. .. Y3 .. ..
+        .. .. .. .. .. .. .. Y0 .. ..
+        .. .. S0 A0 P0 A0 .. .. .. X0
+    ''',
+    'Dynasty': '''
+        x2 .. .. .. y2 a2 y1 .. .. ..
+        .. .. .. y2 .. p0 .. .. .. ..
+        y0 .. .. .. y2 a2 s1 .. .. ..
+        y1 .. .. .. s1 .. y2 .. .. ..
+        .. .. .. Y0 .. S1 .. .. .. Y3
+        .. .. .. S1 A0 Y0 .. .. .. Y2
+        .. .. .. .. P0 .. Y0 .. .. ..
+        .. .. .. Y3 A0 Y0 .. .. .. X0
+    ''',
+}
+SETUP_LETTERS = {'X': Sphinx, 'P': Pharaoh, 'S': Scarab, 'Y': Pyramid, 'A': Anubis}
+_setup_positions = dict() #setup name -> (ranks, files, encoded position)
+
+#Binary position file: header (magic, ranks, files) followed by Board.encode_position bytes
+POSITION_MAGIC = b'KPOS'
+POSITION_HEADER = struct.Struct('<4sBB')
+
+def setup_position(setup = 'Classic') -> tuple:
+    '''Returns (ranks, files, encoded position) of a setup from SETUPS (see the note there) with Silver to move'''
+    if setup not in _setup_positions:
+        rows = [row.split() for row in SETUPS[setup].strip().splitlines()]
+        position = bytearray(len(rows) * len(rows[0]) + 1)
+        for idx, token in enumerate(token for row in rows for token in row):
+            if token != '..':
+                owner = 0 if token[0].islower() else 1
+                position[idx] = (SETUP_LETTERS[token[0].upper()].TYPE_ID << 3) | (owner << 2) | int(token[1])
+        position[-1] = PLAYER_COLORS.index('Silver')
+        _setup_positions[setup] = (len(rows), len(rows[0]), bytes(position))
+    return _setup_positions[setup]
+
+def setup_board(setup = 'Classic', board : Board = None) -> Board:
+    '''
+    Returns a Board holding an opening setup (name from SETUPS, see the note there) with Silver to move.
+    An existing Board of the same size can be passed to be cleared and reused.
+    '''
+    ranks, files, position = setup_position(setup)
+    if board is None:
+        board = Board(ranks, files)
+    board.decode_position(position)
+    return board
+
+class GameDatabase:
+    '''
+    Append-only game record file, read through mmap without copying.
+    File: header (magic, ranks, files), then per game a record header (plies, winner),
+    every position from the start to the final ply (Board.encode_position bytes), then the moves as uint32.
+    A companion <path>.idx file holds the uint64 offset of each game record, so any game or
+    ply is found in O(1). Memoryviews handed out stay valid until close().
+    '''
+    MAGIC = b'KHETDB01'
+    HEADER = struct.Struct('<8sBB6x')
+    RECORD = struct.Struct('<IB3x') #plies, winner (0 none, 1 + PLAYER_COLORS index)
+
+    def __init__(self, path : str, ranks = 8, files = 10):
+        import os
+        self.path = path
+        self._index_path = path + '.idx'
+        if not os.path.exists(path) or not os.path.getsize(path):
+            with open(path, 'wb') as database:
+                database.write(self.HEADER.pack(self.MAGIC, ranks, files))
+            open(self._index_path, 'wb').close()
+        with open(path, 'rb') as database:
+            magic, ranks, files = self.HEADER.unpack(database.read(self.HEADER.size))
+        if magic != self.MAGIC:
+            raise ValueError(f'{path} is not a DigiKhet game database')
+        self.ranks = ranks
+        self.files = files
+        self._stride = ranks * files + 1 #bytes per position
+        self._data = None #mmap of game records
+        self._offsets = None #memoryview of uint64 record offsets
+        self._maps = [] #every mmap opened, closed together by close()
+
+    def _map(self):
+        '''(Re)open the memory maps, needed after appending'''
+        import mmap
+        self._release_maps()
+        with open(self.path, 'rb') as database:
+            self._data = mmap.mmap(database.fileno(), 0, access = mmap.ACCESS_READ)
+        self._maps.append(self._data)
+        with open(self._index_path, 'rb') as index:
+            if index.seek(0, 2):
+                index_map = mmap.mmap(index.fileno(), 0, access = mmap.ACCESS_READ)
+                self._maps.append(index_map)
+                self._offsets = memoryview(index_map).cast('Q')
+            else:
+                self._offsets = memoryview(b'').cast('Q')
+
+    def _release_maps(self):
+        '''Close the open maps, keeping those still referenced by a handed out memoryview'''
+        self._data = self._offsets = None
+        referenced = []
+        for opened in self._maps:
+            try:
+                opened.close()
+            except BufferError:
+                referenced.append(opened) #still referenced by a memoryview, retried on the next release
+        self._maps = referenced
+
+    def close(self):
+        self._release_maps()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        if self._offsets is None:
+            self._map()
+        return len(self._offsets)
+
+    def append(self, start : bytes, moves : list, winner = None) -> int:
+        '''
+        Append a game played from start (encoded position) through moves. Every position is
+        stored by replaying the moves. Returns the game number.
+        '''
+        board = Board(self.ranks, self.files)
+        board.decode_position(start)
+        positions = [board.encode_position()]
+        for move in moves:
+            board.make_move(move)
+            positions.append(board.encode_position())
+        record = self.RECORD.pack(len(moves), 0 if winner is None else PLAYER_COLORS.index(winner) + 1)
+        record += b''.join(positions)
+        record += b'\0' * (-len(record) % 4) #keep moves 4-byte aligned
+        record += struct.pack(f'<{len(moves)}I', *moves)
+        with open(self.path, 'ab') as database:
+            offset = database.seek(0, 2)
+            database.write(record)
+        with open(self._index_path, 'ab') as index:
+            game = index.seek(0, 2) // 8
+            index.write(struct.pack('<Q', offset))
+        self._data = self._offsets = None #maps no longer cover the file, reopened on next read
+        return game
+
+    def _record(self, game : int) -> tuple:
+        '''(offset of first position, plies, winner) of a game'''
+        if self._offsets is None:
+            self._map()
+        offset = self._offsets[game]
+        plies, winner = self.RECORD.unpack_from(self._data, offset)
+        return offset + self.RECORD.size, plies, None if not winner else PLAYER_COLORS[winner - 1]
+
+    def plies(self, game : int) -> int:
+        return self._record(game)[1]
+
+    def winner(self, game : int):
+        return self._record(game)[2]
+
+    def position(self, game : int, ply : int) -> memoryview:
+        '''Encoded position after ply moves of game (ply 0 is the start), as a memoryview into the file'''
+        start, plies, _ = self._record(game)
+        if not 0 <= ply <= plies:
+            raise IndexError(f'Game {game} has {plies} plies')
+        offset = start + ply * self._stride
+        return memoryview(self._data)[offset:offset + self._stride]
+
+    def moves(self, game : int) -> memoryview:
+        '''Moves of game as a memoryview of uint32'''
+        start, plies, _ = self._record(game)
+        offset = start + (plies + 1) * self._stride
+        offset += -offset % 4
+        return memoryview(self._data)[offset:offset + plies * 4].cast('I')
+
+    def iter_positions(self):
+        '''Yields (game, ply, position memoryview) for every stored position, paging the file in as needed'''
+        for game in range(len(self)):
+            start, plies, _ = self._record(game)
+            view = memoryview(self._data)
+            for ply in range(plies + 1):
+                offset = start + ply * self._stride
+                yield game, ply, view[offset:offset + self._stride]
+
+class Laser:
+    '''
+    Class for laser operation.
+    Fires from the owning player's Sphinx in the direction it faces. Beam paths follow the
+    Board Geometry ray tables, so any board size is supported.
+    The last path is cached and only re-traced from the last reflection before the first changed cell.
+    Board.set_state reports changed cells through invalidate().
+    '''
+    def __init__(self, direction, player = None):
+        self._initial_direction = direction
+        self._player = _color(player) if player else None
+        self._board = None #Board the cached path belongs to
+        self._path = [] #cell indexes of cached path, starting with the Sphinx
+        self._pos = dict() #cell index -> first position within _path
+        self._turns = [] #(path position, cell index, direction leaving cell) for Sphinx and each reflection
+        self._dirty = 0 #first path position changed since last beam, None when cache is valid
+        self._result = None #cached beam result
+
+    @property
+    def _last_beam(self):
+        '''Locations of the last beam path, starting with the Sphinx'''
+        if self._board is None:
+            return None
+        coords = self._board.geometry.coords
+        return [coords[cell] for cell in self._path]
+
+    def invalidate(self, board : Board, idx : int):
+        '''Board hook: cell idx changed, drop the cached path from that cell onward'''
+        if board is not self._board:
+            return
+        pos = self._pos.get(idx)
+        if pos is not None and (self._dirty is None or pos < self._dirty):
+            self._dirty = pos
+
+    def detach(self, board : Board):
+        '''Stop observing board and drop the cached path (its Sphinx was removed or replaced)'''
+        if board is self._board:
+            board.remove_observer(self)
+            self._board = None
+            self._dirty = 0
+
+    def _origin(self, board : Board):
+        '''Cell index and direction index the beam starts from'''
+        idx = board._sphinx.get(self._player) if self._player else None
+        if idx is not None:
+            return idx, board._cells[idx] & 3 #Sphinx orientation is its facing direction
+        #no Sphinx on Board for this Laser: fire from the corner implied by direction (Red top left, Silver bottom right)
+        idx = 0 if self._initial_direction in Sphinx.VALID_FACES_FOR['Red'] else board.geometry.cells - 1
+        return idx, DIRECTION_INDEX[self._initial_direction]
+
+    def beam(self, board : Board):
+        '''
+        Uses board_state and initial direction to generate laserbeam path on board.
+        Returns (location, state) of hit gamepiece where state is 'Hit' or 'Block',
+        or (off-board location, 'Wall') when the beam leaves the board.
+        Path of locations is available from _last_beam, starting with the Sphinx.
+        '''
+        if board is not self._board:
+            #cache belongs to another Board, follow this one instead
+            if self._board is not None:
+                self._board.remove_observer(self)
+            board.add_observer(self)
+            self._board = board
+            self._dirty = 0
+        origin, direction = self._origin(board)
+        dirty = self._dirty
+        if dirty is None and self._path[0] == origin:
+            return self._result
+        path = self._path
+        pos = self._pos
+        turns = self._turns
+        if dirty and path[0] == origin:
+            #keep path up to the last reflection before the changed cell, re-trace from there
+            while turns[-1][0] >= dirty:
+                turns.pop()
+            keep, idx, direction = turns[-1]
+            for cell in path[keep + 1:]:
+                if pos.get(cell, 0) > keep:
+                    del pos[cell]
+            del path[keep + 1:]
+        else:
+            idx = origin
+            path.clear()
+            pos.clear()
+            turns.clear()
+            path.append(idx)
+            pos[idx] = 0
+            turns.append((0, idx, direction))
+        self._dirty = None
+        self._result = result = self._trace(board, idx, direction)
+        return result
+
+    def _trace(self, board : Board, idx : int, direction : int):
+        '''Follow rays from cell idx piece to piece until the beam is stopped or leaves the board'''
+        cells = board._cells
+        geometry = board.geometry
+        rays = geometry.rays
+        path = self._path
+        pos = self._pos
+        while True:
+            ray = rays[idx * 4 + direction]
+            for step, target in enumerate(ray):
+                if cells[target]:
+                    break
+            else:
+                for cell in ray:
+                    pos.setdefault(cell, len(path))
+                    path.append(cell)
+                return geometry.walls[idx * 4 + direction], 'Wall'
+            for cell in ray[:step + 1]:
+                pos.setdefault(cell, len(path))
+                path.append(cell)
+            outcome = REFLECT_TABLE[cells[target]][direction]
+            if outcome < HIT: #reflected into a new direction
+                idx, direction = target, outcome
+                self._turns.append((len(path) - 1, idx, direction))
+                continue
+            return geometry.coords[target], OUTCOMES[outcome]
+
+class ThreatMap:
+    '''
+    Reverse-laser threat map. Traces backward from each Pharaoh through the reflect tables to find every
+    (cell, travel direction) from which a beam ends on that Pharaoh: one chain per arrival direction.
+    Attached to a Board as an observer, only chains crossing a changed cell are re-traced, on next use.
+    Answers "does this move open a line to my Pharaoh?" and "which moves win immediately?" by following
+    the cached laser path and only simulating beams for moves that touch it.
+    '''
+    def __init__(self, board : Board):
+        self.board = board
+        self._pharaoh = {player: None for player in PLAYER_COLORS} #Pharaoh cell the chains were traced from
+        self._states = {player: dict() for player in PLAYER_COLORS} #cell*4 + travel -> (chain, position)
+        self._sources = {player: dict() for player in PLAYER_COLORS} #Sphinx cell*4 + facing -> (chain, position)
+        self._chains = {player: [dict() for _ in range(4)] for player in PLAYER_COLORS} #per chain: cell -> first position
+        self._dirty = {player: set(range(4)) for player in PLAYER_COLORS} #chains to re-trace
+        board.add_observer(self)
+
+    def detach(self):
+        '''Stop following the Board'''
+        self.board.remove_observer(self)
+
+    def invalidate(self, board : Board, idx : int):
+        '''Board hook: mark chains crossing cell idx for re-tracing'''
+        for player, chains in self._chains.items():
+            for chain, cells in enumerate(chains):
+                if idx in cells:
+                    self._dirty[player].add(chain)
+
+    def _update(self, player : str):
+        '''Re-trace dirty chains of player'''
+        board = self.board
+        pharaoh = board._pharaoh[player]
+        if pharaoh != self._pharaoh[player]:
+            self._pharaoh[player] = pharaoh
+            self._dirty[player].update(range(4))
+        states, sources, chains = self._states[player], self._sources[player], self._chains[player]
+        for chain in self._dirty[player]:
+            for table in (states, sources):
+                for state in [state for state, (owner, _) in table.items() if owner == chain]:
+                    del table[state]
+            chains[chain] = cells = dict()
+            if pharaoh is None:
+                continue
+            self._trace_chain(chain, pharaoh, cells, states, sources)
+        self._dirty[player].clear()
+
+    def _trace_chain(self, chain : int, pharaoh : int, cells : dict, states : dict, sources : dict):
+        '''Walk backward from the Pharaoh for a beam arriving travelling in direction chain'''
+        board_cells = self.board._cells
+        rays = self.board.geometry.rays
+        idx, travel, position = pharaoh, chain, 0
+        cells[idx] = 0
+        states[idx * 4 + travel] = (chain, 0)
+        while True:
+            for cell in rays[idx * 4 + (travel + 2) % 4]:
+                position += 1
+                cells.setdefault(cell, position)
+                code = board_cells[cell]
+                if not code:
+                    states.setdefault(cell * 4 + travel, (chain, position))
+                    continue
+                if code >> 3 == Sphinx.TYPE_ID:
+                    #a Sphinx facing the travel direction fires straight down this line
+                    sources[cell * 4 + travel] = (chain, position)
+                incoming = REVERSE_TABLE[code][travel]
+                if incoming < 0:
+                    return #nothing sends the beam out of this cell in the travel direction
+                states[cell * 4 + incoming] = (chain, position)
+                idx, travel = cell, incoming
+                break
+            else:
+                return #reached the wall
+
+    def threats(self, player) -> set:
+        '''((rank, file), travel direction) where a beam entering that cell travelling that way ends on player's Pharaoh'''
+        player = _color(player)
+        self._update(player)
+        coords = self.board._coords
+        return {(coords[state >> 2], DIRECTIONS[state & 3]) for state in self._states[player]}
+
+    def sources(self, player) -> set:
+        '''((rank, file), facing) of Sphinx cells that would hit player's Pharaoh if facing that way'''
+        player = _color(player)
+        self._update(player)
+        coords = self.board._coords
+        return {(coords[state >> 2], DIRECTIONS[state & 3]) for state in self._sources[player]}
+
+    def _changes(self, move : int) -> dict:
+        '''Cell codes a move changes: {cell index: new code}'''
+        cells = self.board._cells
+        kind, from_idx, to_idx = move >> 24, move & 0xFFF, (move >> 12) & 0xFFF
+        if kind == MOVE_STEP:
+            return {from_idx: 0, to_idx: cells[from_idx]}
+        if kind == MOVE_SWAP:
+            return {from_idx: cells[to_idx], to_idx: cells[from_idx]}
+        code = cells[from_idx]
+        states = 2 if code >> 3 == Scarab.TYPE_ID else 4
+        turn = 1 if kind == MOVE_CW else -1
+        return {from_idx: (code & ~3) | ((code & 3) + turn) % states}
+
+    def _trace_after(self, laser_player : str, changes : dict, target : str, target_idx : int) -> tuple:
+        '''
+        (end cell, outcome) of laser_player's beam once changes are applied, end cell -1 at a wall.
+        Reuses the cached path up to the first changed cell, then stops early on entering a threat
+        state of target's Pharaoh (at target_idx) whose chain the changes don't touch.
+        '''
+        board = self.board
+        sphinx = board._sphinx[laser_player]
+        if sphinx is None:
+            return -1, WALL
+        laser = board._pieces[sphinx].laser
+        result = laser.beam(board)
+        first = min((laser._pos[idx] for idx in changes if idx in laser._pos), default = None)
+        if first is None:
+            #move touches nothing on the path, outcome unchanged
+            return (-1, WALL) if result[1] == 'Wall' else (board._index[result[0]], OUTCOMES.index(result[1]))
+        if first == 0:
+            idx, travel = sphinx, changes[sphinx] & 3
+        else:
+            _, idx, travel = next(turn for turn in reversed(laser._turns) if turn[0] < first)
+        states = None
+        if target_idx == board._pharaoh[target]:
+            #threat chains are only valid while the Pharaoh stays put
+            self._update(target)
+            states = self._states[target]
+            chains = self._chains[target]
+        cells = board._cells
+        rays = board.geometry.rays
+        for _ in range(board.geometry.cells * 4 + 1):
+            for cell in rays[idx * 4 + travel]:
+                if states is not None and cell not in changes:
+                    threat = states.get(cell * 4 + travel)
+                    if threat is not None:
+                        chain, position = threat
+                        if all(chains[chain].get(changed, position + 1) > position for changed in changes):
+                            return target_idx, HIT
+                code = changes[cell] if cell in changes else cells[cell]
+                if code:
+                    break
+            else:
+                return -1, WALL
+            outcome = REFLECT_TABLE[code][travel]
+            if outcome >= HIT:
+                return cell, outcome
+            idx, travel = cell, outcome
+        return -1, WALL
+
+    def exposes(self, move : int, player = None, mover = None) -> bool:
+        '''
+        Does move (by mover, default side to move) open a line to player's Pharaoh (default mover)?
+        Checks the mover's laser fired after the move, then the other laser in its current facing
+        with any Gamepiece the first beam removed taken off (unless that ended the game).
+        '''
+        board = self.board
+        mover = _color(mover) if mover else board.to_move
+        player = _color(player) if player else mover
+        changes = self._changes(move)
+        pharaoh = board._pharaoh[player]
+        if pharaoh is None:
+            return False
+        if pharaoh in changes and not changes[pharaoh]:
+            pharaoh = (move >> 12) & 0xFFF #Pharaoh stepped
+        end, outcome = self._trace_after(mover, changes, player, pharaoh)
+        if outcome == HIT:
+            if end == pharaoh:
+                return True
+            if changes.get(end, board._cells[end]) >> 3 == Pharaoh.TYPE_ID:
+                return False #other Pharaoh removed (where it stands after the move), game over before the next laser fires
+            changes[end] = 0
+        opponent = 'Red' if mover == 'Silver' else 'Silver'
+        end, outcome = self._trace_after(opponent, changes, player, pharaoh)
+        return outcome == HIT and end == pharaoh
+
+    def winning_moves(self, player = None) -> list:
+        '''Moves for player (default side to move) after which their laser removes the enemy Pharaoh'''
+        board = self.board
+        player = _color(player) if player else board.to_move
+        enemy = 'Red' if player == 'Silver' else 'Silver'
+        pharaoh = board._pharaoh[enemy]
+        sphinx = board._sphinx[player]
+        if pharaoh is None or sphinx is None:
+            return []
+        laser = board._pieces[sphinx].laser
+        location, state = laser.beam(board)
+        hits_now = state == 'Hit' and board._index[location] == pharaoh
+        on_path = laser._pos
+        wins = []
+        for move in board.generate_moves(player):
+            from_idx, to_idx = move & 0xFFF, (move >> 12) & 0xFFF
+            if from_idx not in on_path and to_idx not in on_path:
+                #beam is unchanged by this move
+                if hits_now:
+                    wins.append(move)
+                continue
+            changes = self._changes(move)
+            end, outcome = self._trace_after(player, changes, enemy, pharaoh)
+            if outcome == HIT and end == pharaoh:
+                wins.append(move)
+        return wins
+
+    def safe_moves(self, player = None) -> list:
+        '''Moves for player (default side to move) that don't open a line to their own Pharaoh'''
+        player = _color(player) if player else self.board.to_move
+        return [move for move in self.board.generate_moves(player) if not self.exposes(move, player, player)]
+
+class Searcher:
+    '''
+    Iterative deepening alpha-beta (negamax) search over Board.make_move/unmake_move.
+    Positions are cached in a fixed-size transposition table keyed by Board.hash, kept between
+    searches so later turns reuse earlier work. Moves are ordered by table move, killer moves, then history.
+    '''
+    INFINITY = 1_000_000
+    WIN = 100_000 #score for removing the enemy Pharaoh, less the plies taken to do it
+    MAX_PLY = 64
+    PIECE_VALUES = (0, 0, 0, 0, 100, 150) #per type id, Sphinx, Pharaoh and Scarab can't be removed by others
+    EXACT, LOWER, UPPER = 0, 1, 2 #transposition table bound flags
+
+    def __init__(self, tt_bits = 18, book = None):
+        '''Transposition table holds 2**tt_bits entries. An OpeningBook is consulted before searching if given'''
+        import threading
+        self.book = book
+        self._tt_mask = (1 << tt_bits) - 1
+        self._tt_keys = [0] * (1 << tt_bits)
+        self._tt_entries = [None] * (1 << tt_bits) #(depth, flag, score, move, generation)
+        self._generation = 0
+        self._killers = [[0, 0] for _ in range(self.MAX_PLY)]
+        self._history = dict() #move -> history score
+        self._stop = False
+        self._deadline = None
+        self._next_deadline = None #set_deadline made before the search it is meant for started
+        self._searching = False
+        self._lock = threading.Lock() #guards _deadline, _next_deadline and _searching against set_deadline
+        self.nodes = 0
+        self.tt_hits = 0
+        self.depth = 0
+        self.score = 0
+
+    def stop(self):
+        '''Ask a running search to return as soon as possible (safe to call from another thread)'''
+        self._stop = True
+
+    def set_deadline(self, time_ms):
+        '''
+        Give the running search time_ms more milliseconds from now (None for no time limit), e.g. on ponderhit.
+        Safe to call from another thread; if the search hasn't started yet the deadline is kept for it.
+        '''
+        deadline = None if time_ms is None else time.perf_counter() + time_ms / 1000
+        with self._lock:
+            if self._searching:
+                self._deadline = deadline
+            else:
+                self._next_deadline = deadline
+
+    def clear(self):
+        '''Forget the transposition table and move ordering data'''
+        self._tt_keys = [0] * len(self._tt_keys)
+        self._tt_entries = [None] * len(self._tt_entries)
+        self._killers = [[0, 0] for _ in range(self.MAX_PLY)]
+        self._history.clear()
+
+    def search(self, board : Board, player = None, time_ms = 1000, max_depth = None, report = None):
+        '''
+        Search for the best move for player (default side to move) within time_ms milliseconds,
+        or to max_depth plies. Returns (best move, principal variation list), best move is None
+        if there are no legal moves. A time_ms of None searches until max_depth or stop().
+        report(depth, score, nodes, pv) is called after each completed iteration if given.
+        The Board is left as it was, side to move included.
+        '''
+        to_move = board.to_move
+        if player:
+            board.to_move = player
+        with self._lock:
+            self._searching = True
+            if self._next_deadline is not None:
+                self._deadline, self._next_deadline = self._next_deadline, None
+            else:
+                self._deadline = None if time_ms is None else time.perf_counter() + time_ms / 1000
+        try:
+            return self._search(board, max_depth, report)
+        finally:
+            with self._lock:
+                self._searching = False
+            board.to_move = to_move
+
+    def rank_moves(self, board : Board, depth = 1) -> list:
+        '''
+        Every legal move for the side to move with its score from a depth ply search after it,
+        as (score, move) best first. Not time limited, meant for shallow depths.
+        '''
+        with self._lock:
+            self._deadline = None
+        self._stop = False
+        ranked = []
+        for move in board.generate_moves():
+            board.make_move(move)
+            ranked.append((-self._negamax(board, depth, -self.INFINITY, self.INFINITY, 1), move))
+            board.unmake_move()
+        ranked.sort(key = lambda ranking: ranking[0], reverse = True)
+        return ranked
+
+    def _search(self, board : Board, max_depth, report):
+        '''search for the side to move, _deadline already set'''
+        self._stop = False
+        self._generation = (self._generation + 1) & 0xFF
+        self.nodes = 0
+        self.tt_hits = 0
+        for move in self._history:
+            self._history[move] >>= 1 #age history between searches
+        if self.book is not None:
+            move = self.book.probe(board)
+            if move is not None:
+                self.depth, self.score = 0, 0
+                return move, [move]
+        moves = list(board.generate_moves())
+        if not moves:
+            return None, []
+        threat_map = ThreatMap(board)
+        wins = threat_map.winning_moves()
+        threat_map.detach()
+        if wins:
+            #immediate win, no search needed
+            self.depth, self.score = 1, self.WIN - 1
+            return wins[0], [wins[0]]
+        best_move, pv = moves[0], [moves[0]]
+        max_depth = max_depth or self.MAX_PLY - 1
+        for depth in range(1, max_depth + 1):
+            self._root_move = None
+            score = self._negamax(board, depth, -self.INFINITY, self.INFINITY, 0)
+            if self._stop:
+                break #unfinished iteration, keep the last completed one
+            best_move = self._root_move if self._root_move is not None else best_move
+            self.depth, self.score = depth, score
+            pv = self._principal_variation(board, best_move, depth)
+            if report is not None:
+                report(depth, score, self.nodes, pv)
+            if abs(score) >= self.WIN - self.MAX_PLY:
+                break #forced win or loss found, deeper search won't change it
+        return best_move, pv
+
+    def _principal_variation(self, board : Board, best_move : int, depth : int) -> list:
+        '''Follow transposition table moves from the root'''
+        pv = [best_move]
+        board.make_move(best_move)
+        while len(pv) < depth:
+            slot = board.hash & self._tt_mask
+            if self._tt_keys[slot] != board.hash:
+                break
+            move = self._tt_entries[slot][3]
+            if move not in board.generate_moves():
+                break
+            pv.append(move)
+            board.make_move(move)
+        for _ in pv:
+            board.unmake_move()
+        return pv
+
+    def _evaluate(self, board : Board) -> int:
+        '''Material balance from the side to move's point of view'''
+        values = self.PIECE_VALUES
+        cells = board._cells
+        score = 0
+        for idx in board._player_locs[board._to_move]:
+            score += values[cells[idx] >> 3]
+        for idx in board._player_locs['Red' if board._to_move == 'Silver' else 'Silver']:
+            score -= values[cells[idx] >> 3]
+        return score
+
+    def _negamax(self, board : Board, depth : int, alpha : int, beta : int, ply : int) -> int:
+        self.nodes += 1
+        if not self.nodes & 1023 and self._deadline is not None and time.perf_counter() > self._deadline:
+            self._stop = True
+        if self._stop:
+            return 0
+        winner = board.winner
+        if winner is not None:
+            return self.WIN - ply if winner == board._to_move else ply - self.WIN
+        if depth <= 0 or ply >= self.MAX_PLY - 1:
+            return self._evaluate(board)
+        key = board.hash
+        slot = key & self._tt_mask
+        tt_move = -1
+        if self._tt_keys[slot] == key:
+            entry_depth, flag, score, tt_move, _ = self._tt_entries[slot]
+            self.tt_hits += 1
+            if entry_depth >= depth and ply:
+                #mate scores are stored relative to the node, convert back to the root
+                if score >= self.WIN - self.MAX_PLY:
+                    score -= ply
+                elif score <= self.MAX_PLY - self.WIN:
+                    score += ply
+                if flag == self.EXACT:
+                    return score
+                if flag == self.LOWER and score > alpha:
+                    alpha = score
+                elif flag == self.UPPER and score < beta:
+                    beta = score
+                if alpha >= beta:
+                    return score
+        moves = list(board.generate_moves())
+        if not moves:
+            return self._evaluate(board)
+        killers = self._killers[ply]
+        history = self._history
+        def order(move):
+            if move == tt_move:
+                return 1 << 30
+            if move == killers[0] or move == killers[1]:
+                return 1 << 29
+            return history.get(move, 0)
+        moves.sort(key = order, reverse = True)
+        original_alpha = alpha
+        best_score = -self.INFINITY
+        best_move = moves[0]
+        for move in moves:
+            board.make_move(move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.unmake_move()
+            if self._stop:
+                return 0
+            if score > best_score:
+                best_score, best_move = score, move
+                if ply == 0:
+                    self._root_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if move != killers[0]:
+                            killers[1], killers[0] = killers[0], move
+                        history[move] = history.get(move, 0) + depth * depth
+                        break
+        flag = self.UPPER if best_score <= original_alpha else self.LOWER if best_score >= beta else self.EXACT
+        self._store(slot, key, depth, flag, best_score, best_move, ply)
+        return best_score
+
+    def _store(self, slot : int, key : int, depth : int, flag : int, score : int, move : int, ply : int):
+        '''Replace slot unless it holds a deeper entry for another position from the current search'''
+        entry = self._tt_entries[slot]
+        if entry is not None and self._tt_keys[slot] != key and entry[4] == self._generation and entry[0] > depth:
+            return
+        if score >= self.WIN - self.MAX_PLY:
+            score += ply
+        elif score <= self.MAX_PLY - self.WIN:
+            score -= ply
+        self._tt_keys[slot] = key
+        self._tt_entries[slot] = (depth, flag, score, move, self._generation)
+
+_default_searcher = None #shared Searcher so search() keeps its transposition table between calls
+
+def search(board : Board, player = None, time_ms = 1000):
+    '''Time limited search for player on board. Returns (best move, principal variation)'''
+    global _default_searcher
+    if _default_searcher is None:
+        _default_searcher = Searcher()
+    return _default_searcher.search(board, player, time_ms)
+
+class OpeningBook:
+    '''
+    Read only opening book: best replies keyed by Board.hash, sorted by hash in a compact file
+    that is read through mmap, so a probe is an O(log n) binary search and nothing is loaded up front.
+    File: header (magic, ranks, files, entry count), then entries (hash uint64, move uint32, score int16, depth uint8).
+    Hashes depend on the board size (Geometry keys), so a book only answers for boards of the size it was built on.
+    Written by build_opening_book.
+    '''
+    MAGIC = b'KHETBK01'
+    HEADER = struct.Struct('<8sBB2xI')
+    ENTRY = struct.Struct('<QIhBx')
+
+    def __init__(self, path : str):
+        import mmap
+        self.path = path
+        with open(path, 'rb') as book:
+            magic, self.ranks, self.files, self._count = self.HEADER.unpack(book.read(self.HEADER.size))
+            if magic != self.MAGIC:
+                raise ValueError(f'{path} is not a DigiKhet opening book')
+            self._data = mmap.mmap(book.fileno(), 0, access = mmap.ACCESS_READ) if self._count else b''
+
+    def close(self):
+        if self._count:
+            self._data.close()
+        self._data = b''
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def lookup(self, key : int):
+        '''(move, score, depth) stored for a position hash, or None'''
+        entry, data, base = self.ENTRY, self._data, self.HEADER.size
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) >> 1
+            found = entry.unpack_from(data, base + middle * entry.size)
+            if found[0] < key:
+                low = middle + 1
+            elif found[0] > key:
+                high = middle
+            else:
+                return found[1:]
+        return None
+
+    def probe(self, board : Board):
+        '''Book move for the side to move on board, None if out of book (or the stored move isn't legal here)'''
+        if (board.RANKS, board.FILES) != (self.ranks, self.files):
+            return None
+        found = self.lookup(board.hash)
+        if found is None:
+            return None
+        move = found[0]
+        return move if move in board.generate_moves() else None #guard against hash collisions
+
+    @classmethod
+    def write(cls, path : str, ranks : int, files : int, entries : dict):
+        '''Write a book from {hash: (move, score, depth)}'''
+        with open(path, 'wb') as book:
+            book.write(cls.HEADER.pack(cls.MAGIC, ranks, files, len(entries)))
+            for key in sorted(entries):
+                move, score, depth = entries[key]
+                book.write(cls.ENTRY.pack(key, move, max(-32767, min(32767, score)), min(depth, 255)))
+
+def build_opening_book(path : str, setups = tuple(SETUPS), plies = 4, width = 3, depth = 4, time_ms = None, log = None) -> int:
+    '''
+    Offline book building. From each setup, positions up to plies deep are searched to depth (or for time_ms)
+    and the best move stored. Each position is expanded through its best move and the next width - 1 moves
+    ranked by a shallow search, so the book covers the likely replies as well as the main line.
+    log(message) reports progress if given. Returns the number of positions written.
+    '''
+    searcher = Searcher()
+    entries = dict()
+    size = None
+    for setup in setups:
+        board = setup_board(setup)
+        if size is None:
+            size = (board.RANKS, board.FILES)
+        elif size != (board.RANKS, board.FILES):
+            raise ValueError(f'Setup {setup} is not the size of the others, build it into a separate book')
+        frontier = [board.encode_position()]
+        for ply in range(plies):
+            following = []
+            for position in frontier:
+                board.decode_position(position)
+                if board.hash in entries or board.winner is not None:
+                    continue
+                move, pv = searcher.search(board, None, time_ms, depth)
+                if move is None:
+                    continue
+                entries[board.hash] = (move, searcher.score, searcher.depth)
+                if ply + 1 == plies:
+                    continue
+                ranked = [candidate for score, candidate in searcher.rank_moves(board) if candidate != move]
+                for candidate in [move] + ranked[:width - 1]:
+                    board.make_move(candidate)
+                    if board.winner is None:
+                        following.append(board.encode_position())
+                    board.unmake_move()
+            frontier = following
+            if log is not None:
+                log(f'{setup} ply {ply + 1}: {len(entries)} positions')
+    OpeningBook.write(path, size[0], size[1], entries)
+    return len(entries)
+
+#Outcome index reported by batch_beam when the beam leaves the board (follows OUTCOMES Hit, Block)
+WALL = len(OUTCOMES)
+
+def board_state_to_array(board_state : dict, ranks = 8, files = 10):
+    '''
+    Convert a Board.board_state Dict into a (ranks, files) int8 NumPy array of Gamepiece codes.
+    Stack several with numpy.stack to build a batch for batch_beam.
+    '''
+    import numpy as np
+    array = np.zeros((ranks, files), dtype = np.int8)
+    for (rank, file), gamepiece in board_state.items():
+        if gamepiece is not None:
+            array[rank, file] = gamepiece.code
+    return array
+
+def array_to_board_state(array) -> dict:
+    '''Convert a (ranks, files) array of Gamepiece codes back into a board_state Dict of new Gamepieces'''
+    ranks, files = array.shape
+    return {(rank, file): Gamepiece.from_code(int(array[rank, file])) for rank in range(ranks) for file in range(files)}
+
+def batch_beam(positions) -> dict:
+    '''
+    Trace both Sphinx beams for every position of an (N, ranks, files) int8 array of Gamepiece codes at once.
+    Returns {player: (hit, outcome, path)} where hit is an (N, 2) array holding the (rank, file) of the
+    hit Gamepiece or the off-board location for a wall, outcome is an (N,) int8 array of HIT, BLOCK or WALL,
+    and path is an (N, ranks, files) bool mask of the cells the beam crossed, Sphinx included.
+    Results match Laser.beam for the same positions.
+    '''
+    import numpy as np
+    positions = np.asarray(positions)
+    count, ranks, files = positions.shape
+    cells = positions.reshape(count, ranks * files).astype(np.int16) & 63
+    reflect = np.array(REFLECT_TABLE, dtype = np.int8)
+    step_rank = np.array([step[0] for step in Geometry.STEPS], dtype = np.int16)
+    step_file = np.array([step[1] for step in Geometry.STEPS], dtype = np.int16)
+    boards = np.arange(count)
+    results = dict()
+    for owner, player in enumerate(PLAYER_COLORS):
+        #Sphinx of player (first one found), or the corner Laser.beam falls back to
+        sphinx = (cells >> 2) == ((Sphinx.TYPE_ID << 1) | owner)
+        found = sphinx.any(axis = 1)
+        default_face = Sphinx.VALID_FACES_FOR[player][0]
+        corner = 0 if default_face in Sphinx.VALID_FACES_FOR['Red'] else ranks * files - 1
+        origin = np.where(found, sphinx.argmax(axis = 1), corner)
+        direction = np.where(found, cells[boards, origin] & 3, DIRECTION_INDEX[default_face]).astype(np.int16)
+        rank, file = origin // files, origin % files
+        hit = np.zeros((count, 2), dtype = np.int16)
+        outcome = np.full(count, WALL, dtype = np.int8)
+        path = np.zeros((count, ranks * files), dtype = bool)
+        path[boards, origin] = True
+        active = boards
+        #a beam visits each (cell, direction) at most once, so this bounds the loop
+        for _ in range(ranks * files * 4 + 1):
+            if not active.size:
+                break
+            heading = direction[active]
+            next_rank = rank[active] + step_rank[heading]
+            next_file = file[active] + step_file[heading]
+            off = (next_rank < 0) | (next_rank >= ranks) | (next_file < 0) | (next_file >= files)
+            walled = active[off]
+            hit[walled, 0] = next_rank[off]
+            hit[walled, 1] = next_file[off]
+            outcome[walled] = WALL
+            on = ~off
+            active, heading, next_rank, next_file = active[on], heading[on], next_rank[on], next_file[on]
+            rank[active], file[active] = next_rank, next_file
+            cell = next_rank * files + next_file
+            path[active, cell] = True
+            result = reflect[cells[active, cell], heading]
+            stopped = result >= HIT
+            ended = active[stopped]
+            hit[ended, 0] = next_rank[stopped]
+            hit[ended, 1] = next_file[stopped]
+            outcome[ended] = result[stopped]
+            active = active[~stopped]
+            direction[active] = result[~stopped]
+        results[player] = (hit, outcome, path.reshape(count, ranks, files))
+    return results
+
+class GUI:
+    pass
+    #init based on Board size and state
+    #rank by file grid size, alternating colors (how to implement?)
+    #status section
+        #list both player names
+            #highlight whose turn it is
+        #move / rotate buttons (grayed out if gamepiece not selected)
+        #big red circle with BEAM for pressing laser beam (gray when not applicable)
+    #players gamepieces colored based on their color
+    #laser generation function (arg: beam locations)
+        #line through cell for each location (H line for laser E/W, V line for N/S)
+        #when reflected on gamepiece, change cell to red
+
+class Curator:
+    '''
+    Manages all turn-based states and actions. Actions come from a callable (GUI, engine, network client)
+    so the turn loop also runs headless. Each turn: validate, apply, beam, removal, win check.
+    '''
+    def __init__(self, board : Board = None, players = None, setup = 'Classic'):
+        #initialize Board with default state
+        self.board = board if board is not None else setup_board(setup)
+        #Players by color, Gamepieces are affiliated by color
+        if players:
+            self.players = {player.color: player for player in players}
+        else:
+            self.players = {color: Player(color, color) for color in PLAYER_COLORS}
+        self.moves = [] #integer moves played this game
+        self.last_beam = None #beam result of the last turn
+        self.winner = self.board.winner
+
+    def play_turn(self, move : int):
+        '''
+        Play move for the side to move. Returns beam result (either wall location, or gamepiece location and state).
+        Raises ValueError if the move is illegal or the game is over.
+        '''
+        self._validate(move)
+        self._apply(move)
+        result = self.last_beam = self._beam()
+        self._removal(move, result)
+        self._win_check()
+        return result
+
+    #Turn phases, separate methods so Metrics can time each one
+    def _validate(self, move : int):
+        if self.winner is not None or move not in self.board.generate_moves():
+            raise ValueError(f'Illegal move {move} for {self.board.to_move}')
+
+    def _apply(self, move : int):
+        self.board._apply(move >> 24, move & 0xFFF, (move >> 12) & 0xFFF)
+
+    def _beam(self):
+        return self.board.fire()
+
+    def _removal(self, move : int, result):
+        '''Remove gamepiece if 'Hit', then pass the turn'''
+        captured_idx, captured = self.board._remove_hit(result)
+        self.board._end_turn(move, captured_idx, captured)
+        self.moves.append(move)
+
+    def _win_check(self):
+        self.winner = self.board.winner
+
+    def run(self, get_action, max_turns = None):
+        '''
+        Loop for turn while win state is false. get_action(curator, player) returns the move for player.
+        Returns the winner, or None if max_turns is reached first.
+        '''
+        while self.winner is None and (max_turns is None or len(self.moves) < max_turns):
+            self.play_turn(get_action(self, self.board.to_move))
+        return self.winner
+
+_worker_board = None #Board reused by every tournament game played in a worker process
+
+def _tournament_game(game_id : int, setup : str, seed : int, engines : tuple, max_plies : int, random_plies : int) -> dict:
+    '''
+    Play one headless tournament game in a worker process. Engine 0 plays Silver on even game ids.
+    Only the move list and result are sent back to the parent.
+    '''
+    global _worker_board
+    _worker_board = setup_board(setup, _worker_board)
+    rng = random.Random(seed)
+    engine_for = {'Silver': game_id % 2, 'Red': 1 - game_id % 2}
+    searchers = {color: Searcher(engines[engine].get('tt_bits', 18)) for color, engine in engine_for.items()}
+    def get_action(curator, player):
+        if len(curator.moves) < random_plies:
+            #seeded random opening plies so paired games differ from other pairs
+            return rng.choice(sorted(curator.board.generate_moves()))
+        options = engines[engine_for[player]]
+        move, _ = searchers[player].search(curator.board, player, options.get('time_ms'), options.get('max_depth'))
+        return move
+    curator = Curator(_worker_board)
+    winner = curator.run(get_action, max_plies)
+    return {
+        'game': game_id,
+        'setup': setup,
+        'seed': seed,
+        'silver_engine': engine_for['Silver'],
+        'winner': winner,
+        'winner_engine': None if winner is None else engine_for[winner],
+        'plies': len(curator.moves),
+        'moves': curator.moves,
+    }
+
+def _completed_games(results_path : str) -> list:
+    '''Read finished game records from a results file, dropping a partly written last line'''
+    import json
+    import os
+    if not os.path.exists(results_path):
+        return []
+    with open(results_path, 'rb+') as results:
+        data = results.read()
+        complete = data.rfind(b'\n') + 1
+        if complete != len(data):
+            results.truncate(complete) #interrupted mid write
+    return [json.loads(line) for line in data[:complete].splitlines() if line.strip()]
+
+def run_tournament(games : int, results_path = 'tournament.jsonl', setups = ('Classic', 'Imhotep', 'Dynasty'),
+                   engines = ({'time_ms': 100}, {'time_ms': 100}), max_plies = 200, random_plies = 2, seed = 0, workers = None,
+                   database_path = None) -> dict:
+    '''
+    Play games between two engines (Searcher options time_ms, max_depth, tt_bits) across a process pool.
+    Games come in pairs with the same setup and seed and colors swapped. Each finished game is appended
+    to results_path as a JSON line straight away, games already in the file are skipped so an
+    interrupted tournament resumes where it stopped. With max_depth and no time_ms games are fully deterministic.
+    If database_path is given, finished games are also appended to that GameDatabase.
+    Returns win counts per engine and draws over every game in the file.
+    '''
+    import json
+    from contextlib import nullcontext
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    records = _completed_games(results_path)
+    done = {record['game'] for record in records}
+    with ProcessPoolExecutor(max_workers = workers) as pool, open(results_path, 'a') as results, \
+         (GameDatabase(database_path) if database_path else nullcontext()) as database:
+        futures = [pool.submit(_tournament_game, game_id, setups[(game_id // 2) % len(setups)], seed + game_id // 2,
+                               engines, max_plies, random_plies)
+                   for game_id in range(games) if game_id not in done]
+        for future in as_completed(futures):
+            record = future.result()
+            results.write(json.dumps(record) + '\n')
+            results.flush()
+            records.append(record)
+            if database is not None:
+                database.append(setup_position(record['setup'])[2], record['moves'], record['winner'])
+    summary = {'engine 0': 0, 'engine 1': 0, 'draws': 0}
+    for record in records:
+        summary['draws' if record['winner_engine'] is None else f'engine {record["winner_engine"]}'] += 1
+    return summary
+
+class _ServerGame:
+    '''One hosted game: Curator, per-game lock, delta history for reconnection, subscribed clients'''
+    def __init__(self, game_id : int, setup : str):
+        import asyncio
+        self.id = game_id
+        self.curator = Curator(setup = setup)
+        self.lock = asyncio.Lock() #serializes turns of this game only
+        self.deltas = [] #encoded delta message per ply, deltas[n] leads from ply n to n + 1
+        self.clients = set()
+        self.seats = dict() #color -> seat token
+
+    def snapshot(self) -> bytes:
+        '''Full state message, sent on join and to clients that fell behind'''
+        board = self.curator.board
+        return _server_message({'type': 'snapshot', 'game': self.id, 'ply': len(self.deltas),
+                                'ranks': board.RANKS, 'files': board.FILES, 'cells': list(board._cells),
+                                'to_move': board.to_move, 'winner': self.curator.winner})
+
+class _ServerClient:
+    '''Connected client with a bounded outgoing queue, so a slow reader can't make the server buffer without limit'''
+    def __init__(self, writer, queue_size : int):
+        import asyncio
+        self.writer = writer
+        self.queue = asyncio.Queue(queue_size)
+        self.games = dict() #game id -> _ServerGame subscribed to
+
+    def post(self, item):
+        '''Queue encoded message bytes, or a _ServerGame to send a fresh snapshot of'''
+        import asyncio
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            #client fell behind: drop queued updates, it gets a snapshot of each game it follows instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            for game in list(self.games.values())[:self.queue.maxsize]:
+                self.queue.put_nowait(game)
+
+    async def send_loop(self):
+        while True:
+            item = await self.queue.get()
+            self.writer.write(item.snapshot() if isinstance(item, _ServerGame) else item)
+            await self.writer.drain() #waits while the client's socket buffer is full
+
+def _server_message(message : dict) -> bytes:
+    import json
+    return json.dumps(message, separators = (',', ':')).encode() + b'\n'
+
+class GameServer:
+    '''
+    asyncio network game server hosting many concurrent games in one process.
+    Clients talk newline-delimited JSON over TCP:
+        {"type": "create", "setup": "Classic"}                      -> created (game id)
+        {"type": "join", "game": id, "color": "Silver", "token": t, "since": ply}
+            color (optional) claims a seat, token reclaims it after reconnecting, since resumes from a ply
+        {"type": "move", "game": id, "move": move}                  -> delta to every client of the game
+        {"type": "metrics"}                                          -> METRICS in Prometheus text format
+    After each turn clients receive only the changed cells [[cell index, code], ...] and the laser path,
+    never the full board. Each game has its own lock so a slow game never stalls the others.
+    '''
+    QUEUE_SIZE = 64 #messages buffered per client before it is resynced with a snapshot
+
+    def __init__(self, host = '127.0.0.1', port = 8765):
+        self.host = host
+        self.port = port
+        self.games = dict() #game id -> _ServerGame
+        self._server = None
+
+    async def start(self):
+        '''Start listening, returns the asyncio Server (port 0 picks a free port, see server.sockets)'''
+        import asyncio
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        return self._server
+
+    async def serve_forever(self):
+        server = self._server or await self.start()
+        async with server:
+            await server.serve_forever()
+
+    def create_game(self, setup = 'Classic') -> _ServerGame:
+        game = _ServerGame(len(self.games), setup)
+        self.games[game.id] = game
+        return game
+
+    async def _handle(self, reader, writer):
+        import asyncio
+        import json
+        client = _ServerClient(writer, self.QUEUE_SIZE)
+        sender = asyncio.create_task(client.send_loop())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    await self._dispatch(client, json.loads(line))
+                except (ValueError, KeyError, TypeError) as error:
+                    client.post(_server_message({'type': 'error', 'message': str(error)}))
+        except ConnectionError:
+            pass
+        finally:
+            for game in client.games.values():
+                game.clients.discard(client)
+            sender.cancel()
+            writer.close()
+
+    async def _dispatch(self, client : _ServerClient, message : dict):
+        kind = message['type']
+        if kind == 'create':
+            game = self.create_game(message.get('setup', 'Classic'))
+            client.post(_server_message({'type': 'created', 'game': game.id}))
+        elif kind == 'join':
+            game = self.games[message['game']]
+            color = message.get('color')
+            if color:
+                import secrets
+                token = game.seats.get(color)
+                if token is None:
+                    token = game.seats[color] = message.get('token') or secrets.token_hex(8)
+                elif token != message.get('token'):
+                    raise ValueError(f'{color} seat is taken')
+                client.post(_server_message({'type': 'seat', 'game': game.id, 'color': color, 'token': token}))
+            client.games[game.id] = game
+            game.clients.add(client)
+            since = message.get('since')
+            if isinstance(since, int) and 0 <= since <= len(game.deltas):
+                #reconnecting client resumes from the ply it last saw
+                for delta in game.deltas[since:]:
+                    client.post(delta)
+            else:
+                client.post(game)
+        elif kind == 'move':
+            game = self.games[message['game']]
+            async with game.lock:
+                board = game.curator.board
+                player = board.to_move
+                if game.seats.get(player) is None or game.seats[player] != message.get('token'):
+                    raise ValueError(f'Not seated as {player}')
+                before = bytes(board._cells)
+                result = game.curator.play_turn(int(message['move']))
+                cells = board._cells
+                laser = board._pieces[board._sphinx[player]].laser._last_beam if board._sphinx[player] is not None else []
+                delta = _server_message({
+                    'type': 'delta', 'game': game.id, 'ply': len(game.deltas) + 1, 'move': message['move'],
+                    'cells': [[idx, cells[idx]] for idx in range(len(before)) if before[idx] != cells[idx]],
+                    'laser': laser, 'beam': result, 'to_move': board.to_move, 'winner': game.curator.winner})
+                game.deltas.append(delta)
+                for subscriber in game.clients:
+                    subscriber.post(delta)
+        elif kind == 'metrics':
+            client.post(_server_message({'type': 'metrics', 'enabled': METRICS.enabled, 'text': METRICS.prometheus()}))
+        else:
+            raise ValueError(f'Unknown message type {kind}')
+
+class Metrics:
+    '''
+    Opt-in hot path instrumentation. enable() swaps counting and timing wrappers onto Laser.beam,
+    Board.get_state, Board.generate_moves, Searcher.search and the Curator turn phases; disable()
+    puts the original methods back, so nothing is paid while disabled.
+    Export with snapshot() (dict) or prometheus() (text exposition format).
+    '''
+    PREFIX = 'khet_'
+
+    def __init__(self):
+        self.enabled = False
+        self._originals = dict() #(class, method name) -> original function
+        self.reset()
+
+    def reset(self):
+        self.counters = dict() #(name, labels) -> count
+        self.timers = dict() #(name, labels) -> [calls, total seconds, max seconds]
+
+    def count(self, name : str, amount = 1, labels = ()):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name : str, seconds : float, labels = ()):
+        timer = self.timers.get((name, labels))
+        if timer is None:
+            self.timers[(name, labels)] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+
+    def _patch(self, cls, name : str, wrapper_factory):
+        original = cls.__dict__[name]
+        self._originals[(cls, name)] = original
+        setattr(cls, name, wrapper_factory(original))
+
+    def _timed(self, name : str, labels = ()):
+        '''Wrapper factory timing every call of a method'''
+        observe, clock = self.observe, time.perf_counter
+        def factory(original):
+            def wrapper(*args, **kwargs):
+                start = clock()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    observe(name, clock() - start, labels)
+            wrapper.__wrapped__ = original
+            return wrapper
+        return factory
+
+    def enable(self):
+        '''Install instrumentation wrappers'''
+        if self.enabled:
+            return
+        self.enabled = True
+        count, observe, clock = self.count, self.observe, time.perf_counter
+        def beam(original):
+            def wrapper(laser, board):
+                start = clock()
+                result = original(laser, board)
+                observe('laser_beam', clock() - start)
+                count('laser_beam_path_cells', len(laser._path))
+                return result
+            return wrapper
+        def get_state(original):
+            def wrapper(board, location = None, gamepiece_type = None, player = None):
+                start = clock()
+                result = original(board, location, gamepiece_type, player)
+                mode = '_'.join(part for part, used in (('location', location is not None), ('type', gamepiece_type), ('player', player)) if used)
+                observe('board_get_state', clock() - start, (('mode', mode or 'board'),))
+                return result
+            return wrapper
+        def generate_moves(original):
+            def wrapper(board, player = None):
+                start = clock()
+                moves = list(original(board, player))
+                observe('board_generate_moves', clock() - start)
+                count('board_generated_moves', len(moves))
+                yield from moves
+            return wrapper
+        def search(original):
+            def wrapper(searcher, *args, **kwargs):
+                start = clock()
+                result = original(searcher, *args, **kwargs)
+                observe('search', clock() - start)
+                count('search_nodes', searcher.nodes)
+                count('search_tt_hits', searcher.tt_hits)
+                return result
+            return wrapper
+        self._patch(Laser, 'beam', beam)
+        self._patch(Board, 'get_state', get_state)
+        self._patch(Board, 'generate_moves', generate_moves)
+        self._patch(Searcher, 'search', search)
+        self._patch(Curator, 'play_turn', self._timed('curator_turn'))
+        for phase in ('validate', 'apply', 'beam', 'removal', 'win_check'):
+            self._patch(Curator, '_' + phase, self._timed('curator_phase', (('phase', phase),)))
+
+    def disable(self):
+        '''Restore the original methods, collected metrics are kept'''
+        for (cls, name), original in self._originals.items():
+            setattr(cls, name, original)
+        self._originals.clear()
+        self.enabled = False
+
+    def snapshot(self) -> dict:
+        '''Metrics as {name{labels}: value}, timers as {calls, seconds, max_seconds}'''
+        def key(name, labels):
+            return name + ('{' + ','.join(f'{label}={value}' for label, value in labels) + '}' if labels else '')
+        snapshot = {key(name, labels): value for (name, labels), value in self.counters.items()}
+        for (name, labels), (calls, total, longest) in self.timers.items():
+            snapshot[key(name, labels)] = {'calls': calls, 'seconds': total, 'max_seconds': longest}
+        return snapshot
+
+    def prometheus(self) -> str:
+        '''Metrics in Prometheus text exposition format'''
+        def series(name, labels):
+            return self.PREFIX + name + ('{' + ','.join(f'{label}="{value}"' for label, value in labels) + '}' if labels else '')
+        lines = []
+        typed = set()
+        def add(name, kind, labels, value):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {self.PREFIX}{name} {kind}')
+            lines.append(f'{series(name, labels)} {value}')
+        for (name, labels), value in sorted(self.counters.items()):
+            add(name + '_total', 'counter', labels, value)
+        timers = sorted(self.timers.items())
+        #one pass per series so every metric family stays contiguous
+        for (name, labels), (calls, _, _) in timers:
+            add(name + '_calls_total', 'counter', labels, calls)
+        for (name, labels), (_, total, _) in timers:
+            add(name + '_seconds_total', 'counter', labels, f'{total:.9f}')
+        for (name, labels), (_, _, longest) in timers:
+            add(name + '_seconds_max', 'gauge', labels, f'{longest:.9f}')
+        return '\n'.join(lines) + '\n'
+
+    def profile_turn(self, curator : Curator, move : int, interval = 0.0005) -> tuple:
+        '''
+        Sampling profiler hook around a single turn: plays move on curator while a background thread
+        samples the calling thread's stack every interval seconds.
+        Returns (beam result, {collapsed stack 'outer;...;inner': samples}).
+        '''
+        import sys
+        import threading
+        target = threading.get_ident()
+        samples = dict()
+        done = threading.Event()
+        def sampler():
+            while not done.wait(interval):
+                frame = sys._current_frames().get(target)
+                stack = []
+                while frame is not None:
+                    stack.append(f'{frame.f_code.co_name} ({frame.f_code.co_filename.rsplit("/", 1)[-1]}:{frame.f_lineno})')
+                    frame = frame.f_back
+                collapsed = ';'.join(reversed(stack))
+                samples[collapsed] = samples.get(collapsed, 0) + 1
+        thread = threading.Thread(target = sampler, daemon = True)
+        thread.start()
+        try:
+            result = curator.play_turn(move)
+        finally:
+            done.set()
+            thread.join()
+        return result, samples
+
+METRICS = Metrics() #shared instrumentation, off until METRICS.enable()
+
+def benchmark_positions(count = 48, seed = 0) -> list:
+    '''Fixed corpus of encoded positions: seeded random playouts from each standard setup, stopping short of a win'''
+    rng = random.Random(seed)
+    board = Board()
+    positions = []
+    while len(positions) < count:
+        setup_board(list(SETUPS)[len(positions) % len(SETUPS)], board)
+        for _ in range(rng.randrange(4, 40)):
+            board.make_move(rng.choice(sorted(board.generate_moves())))
+            if board.winner is not None:
+                board.unmake_move()
+                break
+        positions.append(board.encode_position())
+    return positions
+
+def _benchmark_cases(positions : list, search_depth : int) -> dict:
+    '''Benchmark name -> operation taking the iteration number'''
+    boards = []
+    for position in positions:
+        board = Board()
+        board.decode_position(position)
+        boards.append(board)
+    count = len(boards)
+    lasers = [board._pieces[board._sphinx[board.to_move]].laser for board in boards]
+    locations = [board._coords[(i * 7) % board.geometry.cells] for i, board in enumerate(boards)]
+    def beam(i):
+        board, laser = boards[i % count], lasers[i % count]
+        laser.invalidate(board, board._sphinx[board.to_move]) #force a full trace instead of the cached path
+        laser.beam(board)
+    def search_fixed_depth(i):
+        Searcher(tt_bits = 14).search(boards[i % count], None, None, search_depth)
+    return {
+        'beam': beam,
+        'beam cached': lambda i: lasers[i % count].beam(boards[i % count]),
+        'get_state location': lambda i: boards[i % count].get_state(locations[i % count]),
+        'get_state type': lambda i: boards[i % count].get_state(gamepiece_type = 'Pyramid'),
+        'get_state player': lambda i: boards[i % count].get_state(player = 'Red'),
+        'get_state type player': lambda i: boards[i % count].get_state(gamepiece_type = 'Pharaoh', player = 'Silver'),
+        'get_state board': lambda i: boards[i % count].get_state(),
+        'generate_moves': lambda i: list(boards[i % count].generate_moves()),
+        'make_move unmake_move': lambda i: _benchmark_make_unmake(boards[i % count]),
+        'perft 2': lambda i: boards[i % count].perft(2),
+        f'search depth {search_depth}': search_fixed_depth,
+    }
+
+def _benchmark_make_unmake(board : Board):
+    for move in board.generate_moves():
+        board.make_move(move)
+        board.unmake_move()
+
+def run_benchmarks(names = None, seconds = 0.5, seed = 0, search_depth = 3) -> dict:
+    '''
+    Time each benchmark (default all) for about seconds on the fixed position corpus.
+    Ops are timed in batches so fast operations aren't dominated by timer overhead.
+    Returns {'meta': {...}, 'results': {name: ops_per_sec, p50_us, p90_us, p99_us, peak_kib, ops}}.
+    Peak memory comes from a separate tracemalloc pass so it doesn't skew the timings.
+    '''
+    import platform
+    import tracemalloc
+    positions = benchmark_positions(seed = seed)
+    cases = _benchmark_cases(positions, search_depth)
+    results = dict()
+    for name in names or cases:
+        operation = cases[name]
+        #calibrate batch size to about 50 microseconds per sample
+        batch = 1
+        while True:
+            start = time.perf_counter_ns()
+            for i in range(batch):
+                operation(i)
+            if time.perf_counter_ns() - start > 50_000 or batch >= 1 << 16:
+                break
+            batch *= 2
+        samples = []
+        done = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline or len(samples) < 5:
+            start = time.perf_counter_ns()
+            for i in range(done, done + batch):
+                operation(i)
+            samples.append((time.perf_counter_ns() - start) / batch / 1000)
+            done += batch
+        samples.sort()
+        tracemalloc.start()
+        for i in range(min(batch, 64)):
+            operation(i)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {
+            'ops_per_sec': round(1e6 * len(samples) / sum(samples), 1),
+            'p50_us': round(samples[len(samples) // 2], 3),
+            'p90_us': round(samples[int(len(samples) * 0.9)], 3),
+            'p99_us': round(samples[min(int(len(samples) * 0.99), len(samples) - 1)], 3),
+            'peak_kib': round(peak / 1024, 1),
+            'ops': done,
+        }
+    meta = {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+            'machine': platform.machine(), 'seed': seed, 'positions': len(positions), 'search_depth': search_depth,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return {'meta': meta, 'results': results}
+
+def compare_benchmarks(baseline : dict, current : dict, threshold = 0.1) -> list:
+    '''
+    Returns (name, metric, baseline value, current value, relative change) for each benchmark whose
+    ops_per_sec dropped or p50 latency grew by more than threshold (fraction) against baseline.
+    '''
+    regressions = []
+    for name, now in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        change = now['ops_per_sec'] / before['ops_per_sec'] - 1
+        if change < -threshold:
+            regressions.append((name, 'ops_per_sec', before['ops_per_sec'], now['ops_per_sec'], round(change, 3)))
+        change = now['p50_us'] / before['p50_us'] - 1
+        if change > threshold:
+            regressions.append((name, 'p50_us', before['p50_us'], now['p50_us'], round(change, 3)))
+    return regressions
+
+class EngineProtocol:
+    '''
+    Headless text engine protocol (UCI-like) over stdin/stdout, for GUIs, the web server, or other engines.
+    Commands:
+        khet                                    -> id name DigiKhet, khetok
+        isready                                 -> readyok
+        newgame                                 forget search tables
+        position setup <name> [moves m1 m2 ...] setup from SETUPS (Classic, Imhotep, Dynasty approximations)
+        position hex <encoded position> [moves ...]
+        position file <path> [moves ...]        binary position, CSV, or setup name (Board.load_state_file)
+        go [wtime ms] [btime ms] [winc ms] [binc ms] [movestogo n] [movetime ms] [depth n] [infinite] [ponder]
+                                                w is Silver (moves first), b is Red -> info ..., bestmove m [ponder m]
+        stop                                    end the search, bestmove is sent
+        ponderhit                               the pondered move was played, keep searching on the clock
+        d                                       print the position
+        quit
+    Searches run in a background thread so stop and ponderhit are read while thinking.
+    Moves use Board.move_to_text notation.
+    '''
+    GO_OPTIONS = ('wtime', 'btime', 'winc', 'binc', 'movestogo', 'movetime', 'depth')
+
+    def __init__(self, output = None):
+        import sys
+        import threading
+        self.output = output or sys.stdout
+        self.board = setup_board()
+        self._position = self.board.encode_position() #current position, readable while a search runs
+        self.searcher = Searcher()
+        self._thread = None
+        self._release = threading.Event() #set when an infinite or ponder search may report its bestmove
+        self._lock = threading.Lock()
+        self._allotted_ms = None #time allowed once a ponder search becomes a normal one
+
+    def send(self, line : str):
+        with self._lock:
+            self.output.write(line + '\n')
+            self.output.flush()
+
+    def run(self, lines):
+        '''Handle command lines until quit or end of input'''
+        for line in lines:
+            words = line.split()
+            if not words:
+                continue
+            command, args = words[0], words[1:]
+            try:
+                if command == 'quit':
+                    break
+                handler = getattr(self, '_command_' + command, None)
+                if handler is None:
+                    self.send(f'info string unknown command {command}')
+                else:
+                    handler(args)
+            except (ValueError, KeyError, IndexError, OSError) as error:
+                self.send(f'info string error {error}')
+        self._halt()
+
+    def _halt(self):
+        '''Stop a running search and wait for it'''
+        self._release.set()
+        while self._thread is not None and self._thread.is_alive():
+            self.searcher.stop()
+            self._thread.join(0.01)
+        self._thread = None
+
+    def _command_khet(self, args):
+        self.send('id name DigiKhet')
+        self.send('khetok')
+
+    def _command_isready(self, args):
+        self.send('readyok')
+
+    def _command_newgame(self, args):
+        self._halt()
+        self.searcher.clear()
+
+    def _command_position(self, args):
+        self._halt()
+        moves = args.index('moves') if 'moves' in args else len(args)
+        kind, source = args[0], ' '.join(args[1:moves])
+        if kind == 'setup':
+            board = setup_board(source)
+        elif kind == 'hex':
+            board = Board()
+            board.decode_position(bytes.fromhex(source))
+        elif kind == 'file':
+            board = Board(default_state_file = source)
+        else:
+            raise ValueError(f'Unknown position type {kind}')
+        for text in args[moves + 1:]:
+            board.make_move(board.text_to_move(text))
+        self.board = board
+        self._position = board.encode_position()
+
+    def _command_d(self, args):
+        #a running search makes and unmakes moves on self.board, print a copy from the position it started from
+        board = Board(self.board.RANKS, self.board.FILES)
+        board.decode_position(self._position)
+        for rank in range(board.RANKS):
+            row = []
+            for file in range(board.FILES):
+                gamepiece = board.get_state((rank, file))
+                if gamepiece is None:
+                    row.append('..')
+                else:
+                    letter = next(letter for letter, cls in SETUP_LETTERS.items() if isinstance(gamepiece, cls))
+                    row.append((letter.lower() if gamepiece.player == 'Red' else letter) + str(gamepiece.orientation))
+            self.send('info string ' + ' '.join(row))
+        self.send(f'info string {board.to_move} to move, hex {self._position.hex()}')
+
+    def _command_go(self, args):
+        import threading
+        options = dict()
+        flags = set()
+        position = 0
+        while position < len(args):
+            word = args[position]
+            if word in ('infinite', 'ponder'):
+                flags.add(word)
+                position += 1
+            elif word in self.GO_OPTIONS:
+                if position + 1 == len(args):
+                    raise ValueError(f'go {word} needs a value')
+                options[word] = int(args[position + 1])
+                position += 2
+            else:
+                raise ValueError(f'Unknown go option {word}')
+        self._halt()
+        silver = self.board.to_move == 'Silver'
+        if 'movetime' in options:
+            allotted = options['movetime']
+        elif ('wtime' if silver else 'btime') in options:
+            remaining = options['wtime' if silver else 'btime']
+            increment = options.get('winc' if silver else 'binc', 0)
+            allotted = max(1, min(remaining // max(1, options.get('movestogo', 30)) + increment, remaining // 2))
+        else:
+            allotted = None
+        self._allotted_ms = allotted
+        waiting = bool(flags) #infinite and ponder searches only answer after stop or ponderhit
+        self._release.clear()
+        self.searcher.set_deadline(None) #drop a deadline left by a ponderhit that came after its search ended
+        time_ms = None if waiting else allotted
+        max_depth = options.get('depth')
+        if time_ms is None and max_depth is None and not waiting:
+            time_ms = 1000 #no limits given, don't think forever
+        board = self.board
+        def report(depth, score, nodes, pv):
+            self.send(f'info depth {depth} score {score} nodes {nodes} pv ' + ' '.join(board.move_to_text(move) for move in pv))
+        def think():
+            move, pv = self.searcher.search(board, None, time_ms, max_depth, report)
+            if waiting:
+                self._release.wait()
+            if move is None:
+                self.send('bestmove none')
+            elif len(pv) > 1:
+                board.make_move(move)
+                ponder = board.move_to_text(pv[1])
+                board.unmake_move()
+                self.send(f'bestmove {board.move_to_text(move)} ponder {ponder}')
+            else:
+                self.send(f'bestmove {board.move_to_text(move)}')
+        self._thread = threading.Thread(target = think, daemon = True)
+        self._thread.start()
+
+    def _command_ponderhit(self, args):
+        #opponent played the expected move: the ponder search continues on our own clock
+        if self._allotted_ms is not None:
+            self.searcher.set_deadline(self._allotted_ms)
+        else:
+            self.searcher.stop()
+        self._release.set()
+
+    def _command_stop(self, args):
+        self._release.set()
+        self.searcher.stop()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+def engine(book_path = None):
+    '''
+    Text engine entry point: speaks EngineProtocol on stdin/stdout. Nothing GUI related is imported.
+    Opening moves come from the OpeningBook at book_path if given.
+    '''
+    import sys
+    protocol = EngineProtocol()
+    if book_path:
+        protocol.searcher.book = OpeningBook(book_path)
+    protocol.run(sys.stdin)
+
+def debug():
+    '''
+    Debug Interface: uncomment if __name__ statement to activate debug interface
+    '''
+    pass
+
+def main(argv = None):
+    '''Command line entry point. Runs the debug interface when no command is given'''
+    import argparse
+    parser = argparse.ArgumentParser(prog = 'Khet.py', description = 'DigiKhet')
+    commands = parser.add_subparsers(dest = 'command')
+    tournament = commands.add_parser('tournament', help = 'headless self-play tournament across all CPU cores')
+    tournament.add_argument('games', type = int)
+    tournament.add_argument('--results', default = 'tournament.jsonl', help = 'JSON lines results file, resumed if present')
+    tournament.add_argument('--setups', nargs = '+', default = list(SETUPS), choices = list(SETUPS))
+    tournament.add_argument('--time-ms', type = int, default = None,
+                            help = 'per move time limit (default 100, none with --depth so games are deterministic)')
+    tournament.add_argument('--depth', type = int, default = None, help = 'fixed search depth')
+    tournament.add_argument('--b-time-ms', type = int, default = None, help = 'engine 1 time limit (default --time-ms)')
+    tournament.add_argument('--b-depth', type = int, default = None, help = 'engine 1 depth (default --depth)')
+    tournament.add_argument('--max-plies', type = int, default = 200)
+    tournament.add_argument('--random-plies', type = int, default = 2)
+    tournament.add_argument('--seed', type = int, default = 0)
+    tournament.add_argument('--workers', type = int, default = None)
+    tournament.add_argument('--database', default = None, help = 'also append games to this game database')
+    serve = commands.add_parser('serve', help = 'network game server')
+    serve.add_argument('--host', default = '127.0.0.1')
+    serve.add_argument('--port', type = int, default = 8765)
+    serve.add_argument('--metrics', action = 'store_true', help = 'enable hot path instrumentation')
+    bench = commands.add_parser('bench', help = 'benchmark beam, board queries, move generation and search')
+    bench.add_argument('names', nargs = '*', help = 'benchmarks to run (default all)')
+    bench.add_argument('--seconds', type = float, default = 0.5, help = 'time per benchmark')
+    bench.add_argument('--seed', type = int, default = 0)
+    bench.add_argument('--depth', type = int, default = 3, help = 'fixed search depth')
+    bench.add_argument('--output', help = 'save results as JSON')
+    bench.add_argument('--compare', help = 'baseline JSON to check for regressions, exit status 1 if any')
+    bench.add_argument('--threshold', type = float, default = 0.1, help = 'allowed relative slowdown')
+    engine_command = commands.add_parser('engine', help = 'text engine protocol on stdin/stdout')
+    engine_command.add_argument('--book', help = 'opening book file')
+    book = commands.add_parser('book', help = 'build an opening book for the standard setups')
+    book.add_argument('path')
+    book.add_argument('--setups', nargs = '+', default = list(SETUPS), choices = list(SETUPS))
+    book.add_argument('--plies', type = int, default = 4, help = 'book depth from the setup')
+    book.add_argument('--width', type = int, default = 3, help = 'moves followed from each position')
+    book.add_argument('--depth', type = int, default = 4, help = 'search depth per position')
+    book.add_argument('--time-ms', type = int, default = None, help = 'search time per position instead of a fixed depth')
+    args = parser.parse_args(argv)
+    if args.command == 'tournament':
+        if args.time_ms is None and args.depth is None:
+            args.time_ms = 100
+        engine_a = {'time_ms': args.time_ms, 'max_depth': args.depth}
+        engine_b = {'time_ms': args.b_time_ms if args.b_time_ms is not None else args.time_ms,
+                    'max_depth': args.b_depth if args.b_depth is not None else args.depth}
+        print(run_tournament(args.games, args.results, tuple(args.setups), (engine_a, engine_b),
+                             args.max_plies, args.random_plies, args.seed, args.workers, args.database))
+    elif args.command == 'bench':
+        import json
+        current = run_benchmarks(args.names or None, args.seconds, args.seed, args.depth)
+        print(f'{"benchmark":<24}{"ops/sec":>14}{"p50 us":>12}{"p90 us":>12}{"p99 us":>12}{"peak KiB":>10}')
+        for name, result in current['results'].items():
+            print(f'{name:<24}{result["ops_per_sec"]:>14,.1f}{result["p50_us"]:>12.2f}{result["p90_us"]:>12.2f}'
+                  f'{result["p99_us"]:>12.2f}{result["peak_kib"]:>10.1f}')
+        if args.output:
+            with open(args.output, 'w') as output:
+                json.dump(current, output, indent = 2)
+        if args.compare:
+            with open(args.compare) as baseline_file:
+                regressions = compare_benchmarks(json.load(baseline_file), current, args.threshold)
+            for name, metric, before, now, change in regressions:
+                print(f'REGRESSION {name} {metric}: {before} -> {now} ({change:+.1%})')
+            if regressions:
+                raise SystemExit(1)
+    elif args.command == 'engine':
+        engine(args.book)
+    elif args.command == 'book':
+        print(build_opening_book(args.path, tuple(args.setups), args.plies, args.width,
+                                 None if args.time_ms else args.depth, args.time_ms, print), 'positions')
+    elif args.command == 'serve':
+        import asyncio
+        if args.metrics:
+            METRICS.enable()
+        asyncio.run(GameServer(args.host, args.port).serve_forever())
+    else:
+        debug()
+
+if __name__ == '__main__': 
+    main()
+
+'''
+    Rules Dump from wikipedia:
+    Each player starts the game with 14 playing pieces (12 in Deflexion) on a 10x8 board, arranged in one of several predefined configurations, and a laser. The board has some squares (right file, left corners) that are restricted to pieces of one side or the other, preventing the creation of impenetrable fortress positions. In the original game, the lasers were built into the gameboard; in the "Khet 2.0" version, the lasers are instead built into two extra Sphinx playing pieces, which can be rotated as a player's turn even though they cannot be moved from their starting positions. Scarab (formerly "Djed") and Pyramid pieces have mirrors (one on the Pyramid, and two on the Scarab) positioned such that when the laser beam strikes a reflective side, it reflects at a 90° angle. Players try to position pieces in a fashion that allows the laser beam to reflect into the opponent's Pharaoh, thus winning the game; however, they must also try to protect their own Pharaoh from being struck by the laser beam at the same time. On each turn, a player either moves a piece one square in any direction, or rotates a piece 90 degrees clockwise or counterclockwise. After moving, the player must fire his or her laser, and any piece of either color hit on a non-reflecting side is removed from play.
+    The pieces in the game are:
+    Pharaoh (1 of each color)
+        The Pharaoh is the most important piece for each side. If hit with a laser, it is destroyed and its owner loses the game. Similar to a king in chess, the Pharaoh pieces are comparatively weak, and so are often not moved unless under duress.
+    Scarab/Djed (2 of each color)
+        Scarabs (formerly called Djeds) consist primarily of large, dual-sided mirrors. They reflect a laser coming in from any direction, and thus cannot be eliminated from the board. Also, unlike other pieces, Scarabs may move into an adjacent square even if it is already occupied, by switching places with the piece found there (whichever color it may be). Thus, they are the most powerful pieces on the board, but must be used with care, as a move that puts one side of the mirror in a favorable position may expose the player to attack using the opposite side of the same mirror.
+    Pyramid (7 of each color)
+        Pyramids have a single diagonal mirror, and form the primary mechanism for directing the path of the laser. They are vulnerable to a hit from two of the four sides, and must be defended lest the player lose their ability to build paths of any size.
+    Obelisk (2 in Deflexion, 4 in Khet 1, not in Khet 2)
+        Large pillars with no mirrored sides, these are vulnerable to attack from any direction, and therefore useful mostly as an emergency sacrifice to protect another piece (such as the Pharaoh). In Khet 1, each player starts the game with four obelisks each; a laser hit always removes an obelisk.
+    Anubis (2 in Khet 2 only)
+        Anubis replaced Obelisks in Khet 2.0; they have the advantage that, despite still being unmirrored, they are not affected by a laser strike on the front; they must be hit on the sides or rear in order to be eliminated.
+    Sphinx (1 of each color)
+        In Khet 2.0, the Sphinxes hold the lasers. They may not move (each player's is located at their closest right-hand corner) but may be rotated in place so as to fire down the rank instead of the file. A Sphinx is unaffected by laser fire, whether the opponent's or its own reflected back upon itself.
+    Three opening setups are most commonly used: Classic, which is the standard starting configuration, and is the best setup for one's first time playing; Imhotep, which is a variation on the Classic setup that introduces new defensive possibilities; and Dynasty, which has a fairly even mix of offense and defense, and moves quickly. However, any configuration agreed upon by both players can be used. In Deflexion, half the pieces were gold, and half were silver. When the company changed the name to Khet, the gold pieces were changed to red. In Deflexion, gold always goes first, and in Khet, silver always goes first.
+'''
@@ -0,0 +1,41 @@
+'''Shared fixtures: Khet.py lives at the repository root, and a seeded corpus of positions'''
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Khet
+
+def random_positions(seed : int, count : int) -> list:
+    '''
+    Seeded corpus of encoded positions, none of them game over: random playouts from each standard setup,
+    half of them then scrambled (every piece but the Sphinxes moved to a random free cell and orientation)
+    so beams cross many more Gamepieces than in real openings.
+    '''
+    rng = random.Random(seed)
+    board = Khet.Board()
+    positions = []
+    while len(positions) < count:
+        Khet.setup_board(rng.choice(list(Khet.SETUPS)), board)
+        for _ in range(rng.randrange(40)):
+            moves = list(board.generate_moves())
+            if not moves:
+                break
+            board.make_move(rng.choice(moves))
+            if board.winner is not None:
+                board.unmake_move()
+                break
+        if rng.random() < 0.5:
+            cells = list(board.encode_position())
+            movable = [idx for idx in range(board.geometry.cells) if cells[idx] and cells[idx] >> 3 != Khet.Sphinx.TYPE_ID]
+            free = [idx for idx in range(board.geometry.cells) if not cells[idx]] + movable
+            rng.shuffle(free)
+            codes = [cells[idx] for idx in movable]
+            for idx in movable:
+                cells[idx] = 0
+            for idx, code in zip(free, codes):
+                cells[idx] = code & ~3 | rng.randrange(2 if code >> 3 == Khet.Scarab.TYPE_ID else 4)
+            board.decode_position(bytes(cells))
+        positions.append(board.encode_position())
+    return positions
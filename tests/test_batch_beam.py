@@ -0,0 +1,35 @@
+'''batch_beam must match Laser.beam exactly'''
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import Khet
+from conftest import random_positions
+
+def test_batch_beam_matches_laser_beam():
+    positions = random_positions(seed = 6, count = 2000)
+    board = Khet.Board()
+    arrays = []
+    for position in positions:
+        board.decode_position(position)
+        arrays.append(Khet.board_state_to_array(board.board_state, board.RANKS, board.FILES))
+    results = Khet.batch_beam(np.stack(arrays))
+    for number, position in enumerate(positions):
+        board.decode_position(position)
+        for player in Khet.PLAYER_COLORS:
+            hit, outcome, path = results[player]
+            location, state = board.fire(player)
+            laser = board._pieces[board._sphinx[player]].laser
+            assert (int(hit[number, 0]), int(hit[number, 1])) == tuple(location), (number, player)
+            assert ('Wall' if outcome[number] == Khet.WALL else Khet.OUTCOMES[outcome[number]]) == state, (number, player)
+            crossed = {(int(rank), int(file)) for rank, file in zip(*np.nonzero(path[number]))}
+            assert crossed == set(laser._last_beam), (number, player)
+
+def test_board_state_array_round_trip():
+    board = Khet.Board()
+    for position in random_positions(seed = 60, count = 200):
+        board.decode_position(position)
+        array = Khet.board_state_to_array(board.board_state, board.RANKS, board.FILES)
+        assert bytes(array.astype(np.uint8).ravel()) == position[:-1]
+        state = Khet.array_to_board_state(array)
+        assert Khet.board_state_to_array(state, board.RANKS, board.FILES).tolist() == array.tolist()
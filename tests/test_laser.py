@@ -0,0 +1,24 @@
+'''Laser.beam's cached path must match a fresh trace after any make/unmake sequence'''
+import random
+
+import Khet
+
+def test_cached_beam_matches_fresh_board():
+    rng = random.Random(3)
+    board = Khet.Board()
+    for game in range(60):
+        Khet.setup_board(rng.choice(list(Khet.SETUPS)), board)
+        for _ in range(60):
+            moves = list(board.generate_moves())
+            if not moves or rng.random() < 0.2 and board._history:
+                board.unmake_move()
+            else:
+                board.make_move(rng.choice(moves))
+                if board.winner is not None:
+                    board.unmake_move()
+            fresh = Khet.Board()
+            fresh.decode_position(board.encode_position())
+            for player in Khet.PLAYER_COLORS:
+                assert board.fire(player) == fresh.fire(player), (game, player)
+                assert board._pieces[board._sphinx[player]].laser._last_beam == \
+                    fresh._pieces[fresh._sphinx[player]].laser._last_beam, (game, player)
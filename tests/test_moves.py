@@ -0,0 +1,33 @@
+'''Move generation and make/unmake'''
+import random
+
+import pytest
+
+import Khet
+
+@pytest.mark.parametrize('setup, perft_1, perft_2', [('Classic', 77, 5902), ('Imhotep', 81, 6453), ('Dynasty', 70, 4899)])
+def test_perft(setup, perft_1, perft_2):
+    board = Khet.setup_board(setup)
+    assert board.perft(1) == perft_1
+    assert board.perft(2) == perft_2
+
+def test_make_unmake_restores_position_and_hash():
+    rng = random.Random(4)
+    board = Khet.Board()
+    for setup in Khet.SETUPS:
+        Khet.setup_board(setup, board)
+        for _ in range(40):
+            moves = list(board.generate_moves())
+            if not moves:
+                break
+            before = board.encode_position(), board.hash
+            for move in moves:
+                board.make_move(move)
+                board.unmake_move()
+                assert (board.encode_position(), board.hash) == before, board.move_to_text(move)
+            board.make_move(rng.choice(moves))
+            if board.winner is not None:
+                break
+        fresh = Khet.Board()
+        fresh.decode_position(board.encode_position())
+        assert board.hash == fresh.hash
@@ -0,0 +1,34 @@
+'''Searcher must leave the Board as it found it'''
+import time
+
+import Khet
+
+def test_search_for_other_side_restores_board():
+    board = Khet.setup_board('Dynasty')
+    board.make_move(next(board.generate_moves()))
+    position, key = board.encode_position(), board.hash
+    searcher = Khet.Searcher(tt_bits = 12)
+    move, pv = searcher.search(board, 'Silver', None, 2)
+    assert move in list(board.generate_moves('Silver'))
+    assert board.to_move == 'Red'
+    assert board.encode_position() == position
+    assert board.hash == key
+
+def test_deadline_set_before_search_starts_is_kept():
+    board = Khet.setup_board('Classic')
+    searcher = Khet.Searcher(tt_bits = 12)
+    searcher.set_deadline(200) #e.g. a ponderhit that arrives before the search thread gets going
+    started = time.perf_counter()
+    move, pv = searcher.search(board, None, None)
+    assert move is not None
+    assert time.perf_counter() - started < 5
+    assert searcher._next_deadline is None
+
+def test_rank_moves_after_timed_search():
+    board = Khet.setup_board('Classic')
+    searcher = Khet.Searcher(tt_bits = 12)
+    searcher.search(board, None, 20) #leaves a passed deadline behind
+    ranked = searcher.rank_moves(board)
+    assert sorted(move for score, move in ranked) == sorted(board.generate_moves())
+    assert len({score for score, move in ranked}) > 1
+    assert [score for score, move in ranked] == sorted((score for score, move in ranked), reverse = True)
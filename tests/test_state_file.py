@@ -0,0 +1,16 @@
+'''Saved positions must reload exactly, side to move included'''
+import pytest
+
+import Khet
+
+@pytest.mark.parametrize('suffix', ['.csv', '.kpos'])
+def test_state_file_round_trip(tmp_path, suffix):
+    board = Khet.setup_board('Dynasty')
+    board.make_move(next(board.generate_moves()))
+    path = str(tmp_path / ('position' + suffix))
+    board.save_state_file(path)
+    loaded = Khet.Board()
+    loaded.load_state_file(path)
+    assert loaded.to_move == 'Red'
+    assert loaded.encode_position() == board.encode_position()
+    assert loaded.hash == board.hash
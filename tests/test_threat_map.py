@@ -0,0 +1,55 @@
+'''ThreatMap answers must match playing the moves out'''
+import Khet
+from conftest import random_positions
+
+def exposes_by_playing(board : Khet.Board, move : int, player : str) -> bool:
+    '''Play move, then fire the other laser: is player's Pharaoh removed or hit before the game ends?'''
+    board.make_move(move)
+    try:
+        if board._pharaoh[player] is None:
+            return True
+        if board.winner is not None:
+            return False
+        location, state = board.fire()
+        return state == 'Hit' and board._index[location] == board._pharaoh[player]
+    finally:
+        board.unmake_move()
+
+def winning_by_playing(board : Khet.Board) -> list:
+    enemy = 'Red' if board.to_move == 'Silver' else 'Silver'
+    wins = []
+    for move in board.generate_moves():
+        board.make_move(move)
+        if board._pharaoh[enemy] is None:
+            wins.append(move)
+        board.unmake_move()
+    return wins
+
+def test_threat_map_matches_brute_force():
+    board = Khet.Board()
+    for position in random_positions(seed = 12, count = 400):
+        board.decode_position(position)
+        threat_map = Khet.ThreatMap(board)
+        try:
+            assert sorted(threat_map.winning_moves()) == sorted(winning_by_playing(board)), position.hex()
+            for move in board.generate_moves():
+                for player in Khet.PLAYER_COLORS:
+                    assert threat_map.exposes(move, player) == exposes_by_playing(board, move, player), \
+                        (position.hex(), board.move_to_text(move), player)
+        finally:
+            threat_map.detach()
+
+def test_safe_moves_for_either_side():
+    board = Khet.Board()
+    played = Khet.Board()
+    for position in random_positions(seed = 13, count = 150):
+        board.decode_position(position)
+        threat_map = Khet.ThreatMap(board)
+        try:
+            for player in Khet.PLAYER_COLORS:
+                #play the moves out with player to move, on a copy so board keeps its side to move
+                played.decode_position(position[:-1] + bytes((Khet.PLAYER_COLORS.index(player),)))
+                expected = [move for move in played.generate_moves() if not exposes_by_playing(played, move, player)]
+                assert threat_map.safe_moves(player) == expected, (position.hex(), player)
+        finally:
+            threat_map.detach()